@@ -0,0 +1,228 @@
+"""Benchmark server-side vs local LULC classification against a fake Earth Engine.
+
+    python benchmarks/bench_classification.py --box 0.1 0.25 --classifier "Random Forest"
+
+The stand-in ``ee`` module answers computePixels and computeFeatures with
+synthetic, learnable Landsat bands and labels after ``--latency`` seconds, and
+map id and getInfo requests after ``--train-latency`` seconds. The server-side
+path runs the real ``utils.classification.classify`` code against it, followed
+by the map tiles covering the ROI at zoom 12 (about the Landsat resolution),
+fetched six at a time like a browser does, ``--latency`` each. The local path
+runs the real download, training and prediction code. Both engines also run
+the real ``compare`` of all classifiers.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LULC_CACHE_DIR", tempfile.mkdtemp(prefix="bench_lulc_"))
+
+BANDS = ("SR_B2", "SR_B3", "SR_B4", "SR_B5", "SR_B6", "SR_B7")
+# Size in metres of the synthetic land cover patches.
+PATCH = 2000
+PALETTE = [f"#{i * 0x1C1C1C:06x}" for i in range(9)]
+VIS_PARAMS = {"min": 1, "max": 9, "palette": PALETTE}
+
+
+class _Expression:
+    """Chainable stand-in for ee.Image / ee.ImageCollection / ee.Geometry.
+
+    ``getMapId`` and ``getInfo`` answer after ``latency`` seconds, the time
+    Earth Engine spends training and applying a classifier. ``Rectangle`` and
+    ``sample`` remember the ROI and pixel count for ``computeFeatures``.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.bounds = (0, 0, 1, 1)
+        self.num_pixels = 0
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def Rectangle(self, coords, *args):
+        self.bounds = coords
+        return self
+
+    def sample(self, region=None, numPixels=0, **kwargs):
+        self.num_pixels = numPixels
+        return self
+
+    def getMapId(self, vis_params=None):
+        time.sleep(self.latency)
+        url = "https://earthengine.googleapis.com/{z}/{x}/{y}"
+        return {"tile_fetcher": types.SimpleNamespace(url_format=url)}
+
+    def getInfo(self):
+        time.sleep(self.latency)
+        return {"matrix": [[0]], "accuracy": 0.0, "kappa": 0.0}
+
+
+def synthetic(xs, ys, rng):
+    """Return learnable band values and labels at EPSG:3857 coordinates."""
+    patch = (xs // PATCH).astype(np.int64) * 7919 + (ys // PATCH).astype(
+        np.int64
+    ) * 104729
+    classes = (patch % 9 + 1).astype(np.uint16)
+    values = {"b1": classes}
+    for i, band in enumerate(BANDS):
+        mean = 8000 + 1500 * ((classes * (i + 3)) % 7)
+        values[band] = (mean + rng.normal(0, 400, classes.shape)).astype(np.uint16)
+    return values
+
+
+def fake_ee(latency, train_latency):
+    expression = _Expression(train_latency)
+
+    def compute_pixels(params):
+        time.sleep(latency)
+        grid = params["grid"]
+        width = grid["dimensions"]["width"]
+        height = grid["dimensions"]["height"]
+        transform = grid["affineTransform"]
+        xs = transform["translateX"] + transform["scaleX"] * np.arange(width)
+        ys = transform["translateY"] + transform["scaleY"] * np.arange(height)
+        rng = np.random.default_rng(abs(int(xs[0] + ys[0])))
+        values = synthetic(xs[None, :], ys[:, None], rng)
+        fields = [(band, "u2") for band in BANDS + ("b1",)]
+        block = np.zeros((height, width), dtype=fields)
+        for band, value in values.items():
+            block[band] = value
+        return block
+
+    def compute_features(params):
+        import geopandas as gpd
+
+        from utils.tiling import to_mercator
+
+        time.sleep(latency)
+        west, south, east, north = expression.bounds
+        rng = np.random.default_rng(expression.num_pixels)
+        lons = rng.uniform(west, east, expression.num_pixels)
+        lats = rng.uniform(south, north, expression.num_pixels)
+        xs, ys = np.array([to_mercator(lon, lat) for lon, lat in zip(lons, lats)]).T
+        return gpd.GeoDataFrame(
+            synthetic(xs, ys, rng), geometry=gpd.points_from_xy(lons, lats)
+        )
+
+    ee = types.ModuleType("ee")
+    for name in (
+        "Image",
+        "ImageCollection",
+        "Geometry",
+        "Filter",
+        "Classifier",
+        "Feature",
+        "FeatureCollection",
+        "Dictionary",
+    ):
+        setattr(ee, name, expression)
+    ee.data = types.SimpleNamespace(
+        computePixels=compute_pixels, computeFeatures=compute_features
+    )
+    return ee
+
+
+def tile_count(bounds, zoom=12):
+    """Return the number of map tiles covering ``bounds`` at ``zoom``."""
+
+    def tile(lon, lat):
+        n = 2**zoom
+        x = int((lon + 180) / 360 * n)
+        y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+        return x, y
+
+    x0, y0 = tile(bounds[0], bounds[3])
+    x1, y1 = tile(bounds[2], bounds[1])
+    return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+
+def server_side(key, latency):
+    """Wall time of classifying on Earth Engine and streaming its tiles.
+
+    Runs the real ``utils.classification.classify`` path, whose map id request
+    waits for training, then fetches the tiles six at a time like a browser.
+    """
+    from utils.classification import classify, roi_bounds
+
+    count = tile_count(roi_bounds(*key[:3]))
+    start = time.perf_counter()
+    classify(key, VIS_PARAMS)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        list(executor.map(lambda _: time.sleep(latency), range(count)))
+    return time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--box", type=float, nargs="+", default=[0.05, 0.1, 0.25])
+    parser.add_argument("--classifier", default="Random Forest")
+    parser.add_argument("--pixels", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--train-latency", type=float, default=5.0)
+    args = parser.parse_args()
+
+    sys.modules["ee"] = fake_ee(args.latency, args.train_latency)
+    from utils.classification import LOCAL, classification_key, compare, roi_bounds
+    from utils.local_classification import (
+        download,
+        make_learner,
+        predict,
+        sample_split,
+    )
+
+    print(
+        f"{'box':>6} {'server':>9} {'tiles':>6} {'download':>9} {'train':>7} "
+        f"{'predict':>8} {'local':>8} {'warm':>7} {'compare':>8} {'local':>8}"
+    )
+    for box in args.box:
+        key = classification_key(
+            18.2335, 73.2626, box, args.classifier, BANDS, args.pixels
+        )
+        bounds = roi_bounds(*key[:3])
+        server, tiles = server_side(key, args.latency)
+
+        start = time.perf_counter()
+        pixels = download(bounds)
+        downloaded = time.perf_counter() - start
+        features, labels, _, _ = sample_split(pixels, args.pixels)
+        model = make_learner(args.classifier).fit(features, labels)
+        trained = time.perf_counter() - start - downloaded
+        predict(model, pixels)
+        local = time.perf_counter() - start
+        predicted = local - downloaded - trained
+
+        # A second classifier over the same ROI reuses the downloaded pixels.
+        start = time.perf_counter()
+        pixels = download(bounds)
+        features, labels, _, _ = sample_split(pixels, args.pixels, seed=1)
+        predict(make_learner(args.classifier).fit(features, labels), pixels)
+        warm = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compare(key)
+        compared = time.perf_counter() - start
+        start = time.perf_counter()
+        compare(key[:7] + (LOCAL,))
+        compared_locally = time.perf_counter() - start
+
+        print(
+            f"{box:6.2f} {server:8.2f}s {tiles:6d} {downloaded:8.2f}s "
+            f"{trained:6.2f}s {predicted:7.2f}s {local:7.2f}s {warm:6.2f}s "
+            f"{compared:7.2f}s {compared_locally:7.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
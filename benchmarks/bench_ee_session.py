@@ -0,0 +1,74 @@
+"""Benchmark per-rerun Earth Engine startup cost: initialize every rerun vs once.
+
+    python benchmarks/bench_ee_session.py --reruns 50 --sessions 8 --init-latency 1.5
+
+By default a stand-in ``ee`` module sleeps ``--init-latency`` seconds in
+``Initialize``, like the token exchange and project check of the real call.
+``--real`` uses the installed earthengine-api and its stored credentials.
+``--sessions`` threads rerun concurrently, as Streamlit sessions do.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fake_ee(latency):
+    ee = types.ModuleType("ee")
+    ee.EEException = type("EEException", (Exception,), {})
+    ee.calls = 0
+    lock = threading.Lock()
+
+    def initialize(project=None):
+        with lock:
+            ee.calls += 1
+        time.sleep(latency)
+
+    ee.Initialize = initialize
+    return ee
+
+
+def run(rerun, sessions, reruns):
+    """Return the total and per-rerun wall time of ``reruns`` in each session."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(lambda _: [rerun() for _ in range(reruns)], range(sessions)))
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed / (sessions * reruns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--init-latency", type=float, default=1.0)
+    parser.add_argument("--real", action="store_true")
+    args = parser.parse_args()
+
+    if not args.real:
+        sys.modules["ee"] = fake_ee(args.init_latency)
+    import ee
+
+    from utils.ee_session import PROJECT, Session
+
+    elapsed, per_rerun = run(
+        lambda: ee.Initialize(project=PROJECT), args.sessions, args.reruns
+    )
+    print(f"initialize every rerun  {elapsed:8.2f}s  {per_rerun * 1000:9.3f} ms/rerun")
+
+    session = Session()
+    calls = getattr(ee, "calls", 0)
+    elapsed, per_rerun = run(session.initialize, args.sessions, args.reruns)
+    print(f"shared session          {elapsed:8.2f}s  {per_rerun * 1000:9.3f} ms/rerun")
+    if not args.real:
+        print(f"Initialize calls        {ee.calls - calls:8d}")
+    print(session.health())
+
+
+if __name__ == "__main__":
+    main()
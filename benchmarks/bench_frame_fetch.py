@@ -0,0 +1,72 @@
+"""Benchmark serial vs concurrent thumbnail downloads against a fake server.
+
+    python benchmarks/bench_frame_fetch.py --frames 200 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frame_fetch import FrameFetcher  # noqa: E402
+
+
+def make_handler(latency, size):
+    body = os.urandom(size)
+
+    class ThumbnailHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThumbnailHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, args.size))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [
+        f"http://127.0.0.1:{server.server_port}/thumb/{i}" for i in range(args.frames)
+    ]
+
+    fetcher = FrameFetcher(concurrency=1)
+    start = time.perf_counter()
+    fetcher.fetch_serial(urls)
+    serial = time.perf_counter() - start
+    fetcher.close()
+    print(f"serial          {serial:8.2f}s")
+
+    for concurrency in args.concurrency:
+        fetcher = FrameFetcher(concurrency=concurrency)
+        start = time.perf_counter()
+        frames = fetcher.fetch(urls)
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+        assert len(frames) == len(urls)
+        print(
+            f"concurrency {concurrency:3d} {elapsed:8.2f}s  ({serial / elapsed:.1f}x)"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,183 @@
 import ee
 import json
 import os
+import time
 import warnings
 import datetime
-import fiona
 import geopandas as gpd
 import folium
 import streamlit as st
-import geemap.colormaps as cm
+import streamlit.components.v1 as components
 import geemap.foliumap as geemap
 from datetime import date
 from shapely.geometry import Polygon
+from utils.jobs import JobQueue
+from utils.roi import load_upload
+from utils.estimate import describe, estimate
+from utils.frame_store import fire_path, hls_dir, open_frames
+from utils.static_server import BASE_URL as STATIC_BASE_URL, StaticServer
+from utils.assets import AssetMetadata, describe as describe_asset
+from utils import colormaps as cm
+from utils.catalog import CatalogIndex
+from utils.ee_session import require_earth_engine
+from utils.geocode import GeocodeCache
+from utils.render_cache import RenderCache
+from utils.timelapse import build_spec, gdf_to_geojson
 
 st.set_page_config(layout="wide")
 warnings.filterwarnings("ignore")
+require_earth_engine()
 
 
-@st.cache_data
-def ee_authenticate(token_name="EARTHENGINE_TOKEN"):
-    geemap.ee_initialize(token_name=token_name)
-ee.Initialize(project='lulc-429712')
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+
+@st.cache_resource
+def get_render_cache():
+    return RenderCache()
+
+
+@st.cache_resource
+def get_geocoder():
+    return GeocodeCache()
+
+
+@st.cache_resource
+def get_catalog():
+    return CatalogIndex()
+
+
+@st.cache_resource
+def get_asset_metadata():
+    return AssetMetadata()
+
+
+def wait_for_job(job_id, empty_text):
+    """Poll a background timelapse job until it finishes and return (gif, mp4)."""
+    queue = get_job_queue()
+    progress_bar = st.progress(0.0)
+    while True:
+        job = queue.get(job_id)
+        if job is None or job["status"] in ("done", "failed"):
+            progress_bar.empty()
+            st.session_state.pop("timelapse_job", None)
+            if job is None or job["status"] == "failed":
+                raise RuntimeError(job["error"] if job else "Unknown timelapse job.")
+            if job["stats"]:
+                st.caption(
+                    ", ".join(
+                        f"{name.replace('_', ' ')}: {value}"
+                        for name, value in job["stats"].items()
+                    )
+                )
+            cache = get_render_cache().stats()
+            st.caption(
+                f"Render cache: {cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['evictions']} evictions, {cache['entries']} entries "
+                f"({cache['bytes'] / 1e6:.1f} MB)"
+            )
+            st.session_state["timelapse_gif"] = job["out_gif"]
+            return job["out_gif"], job["out_mp4"]
+        total = max(job["frames_total"], 1)
+        progress_bar.progress(min(job["frames_done"] / total, 1.0))
+        empty_text.text(
+            f"Computing... Please wait... ({job['frames_done']}/{job['frames_total']} frames)"
+        )
+        time.sleep(1)
+
+
+def preflight(spec, empty_text):
+    """Show the estimated size of a request; return False if Earth Engine would
+    refuse it, after warning with the suggested changes."""
+    result = estimate(spec)
+    if result is None:
+        return True
+    st.caption(f"Estimated: {describe(result)}")
+    if result["exceeds_limits"]:
+        hints = " or ".join(
+            f"at most {value} frames" if name == "frames" else f"{name} {value}"
+            for suggestion in result["suggestions"]
+            for name, value in suggestion.items()
+        )
+        empty_text.warning(
+            "This request exceeds the Earth Engine size or time limit."
+            + (f" Try {hints}." if hints else " Try a smaller ROI or date range.")
+        )
+        return False
+    return True
+
+
+@st.cache_resource
+def get_static_server():
+    # Without a public base URL the browser could not reach the server, so
+    # the media is inlined by Streamlit instead.
+    if not STATIC_BASE_URL:
+        return None
+    try:
+        return StaticServer()
+    except OSError:
+        return None
+
+
+def artifact(path):
+    """Return a cacheable URL for a rendered file, or the path to inline it."""
+    server = get_static_server()
+    return server.url(path) if server is not None else path
+
+
+def renditions_checkbox():
+    """Offer HLS renditions, which can only be played from the static server."""
+    if get_static_server() is None:
+        return False
+    return st.checkbox("Add adaptive streaming renditions (HLS)", False)
+
+
+def show_video(out_gif, out_mp4):
+    """Play the HLS renditions of a timelapse when present, else its MP4."""
+    server = get_static_server()
+    master = os.path.join(hls_dir(out_gif), "master.m3u8")
+    if server is None or not os.path.exists(master):
+        st.video(artifact(out_mp4))
+        return
+    src = server.url(hls_dir(out_gif), "master.m3u8")
+    components.html(
+        f"""
+        <video id="timelapse" controls style="width: 100%"></video>
+        <script src="https://cdn.jsdelivr.net/npm/hls.js@1"></script>
+        <script>
+          const video = document.getElementById("timelapse");
+          if (video.canPlayType("application/vnd.apple.mpegurl")) {{
+            video.src = "{src}";
+          }} else if (window.Hls && Hls.isSupported()) {{
+            const hls = new Hls();
+            hls.loadSource("{src}");
+            hls.attachMedia(video);
+          }} else {{
+            video.src = "{artifact(out_mp4)}";
+          }}
+        </script>
+        """,
+        height=480,
+    )
+
+
+def show_frame_scrubber(out_gif):
+    """Show one frame of a finished timelapse picked with a slider."""
+    store = open_frames(out_gif)
+    if store is None or len(store[0]) < 2:
+        return
+    frames, labels = store
+    index = st.slider("Scrub through the frames:", 1, len(frames), 1)
+    st.image(frames[index - 1], caption=labels[index - 1], use_column_width=True)
+
+
+def run_job(spec, empty_text):
+    """Render a timelapse spec in the background, keeping the job across reruns."""
+    job_id = get_job_queue().submit(spec)
+    st.session_state["timelapse_job"] = job_id
+    return wait_for_job(job_id, empty_text)
 
 goes_rois = {
     "India": {
@@ -136,24 +294,7 @@ ocean_rois = {
 
 @st.cache_data
 def uploaded_file_to_gdf(data):
-    import tempfile
-    import os
-    import uuid
-
-    _, file_extension = os.path.splitext(data.name)
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(tempfile.gettempdir(), f"{file_id}{file_extension}")
-
-    with open(file_path, "wb") as file:
-        file.write(data.getbuffer())
-
-    if file_path.lower().endswith(".kml"):
-        fiona.drvsupport.supported_drivers["KML"] = "rw"
-        gdf = gpd.read_file(file_path, driver="KML")
-    else:
-        gdf = gpd.read_file(file_path)
-
-    return gdf
+    return load_upload(data.getvalue(), data.name)
 
 
 def app():
@@ -180,7 +321,6 @@ def app():
     st.session_state["vis_params"] = None
 
     with row1_col1:
-        ee_authenticate(token_name="EARTHENGINE_TOKEN")
         m = geemap.Map(
             basemap="HYBRID",
             plugin_Draw=True,
@@ -194,9 +334,15 @@ def app():
 
         keyword = st.text_input("Search for a location:", "")
         if keyword:
-            locations = geemap.geocode(keyword)
-            if locations is not None and len(locations) > 0:
-                str_locations = [str(g)[1:-1] for g in locations]
+            geocoder = get_geocoder()
+            locations = geocoder.geocode(keyword)
+            # Places found by earlier searches are offered after the geocoder's.
+            known = {g.address for g in locations}
+            locations += [
+                g for g in geocoder.suggest(keyword) if g.address not in known
+            ]
+            if len(locations) > 0:
+                str_locations = [g.address for g in locations]
                 location = st.selectbox("Select a location:", str_locations)
                 loc_index = str_locations.index(location)
                 selected_loc = locations[loc_index]
@@ -243,11 +389,7 @@ def app():
             keyword = st.text_input("Enter a keyword to search (e.g., MODIS):", "")
             if keyword:
 
-                assets = geemap.search_ee_data(keyword)
-                ee_assets = []
-                for asset in assets:
-                    if asset["ee_id_snippet"].startswith("ee.ImageCollection"):
-                        ee_assets.append(asset)
+                ee_assets = get_catalog().search(keyword, types=["image_collection"])
 
                 asset_titles = [x["title"] for x in ee_assets]
                 dataset = st.selectbox("Select a dataset:", asset_titles)
@@ -273,14 +415,15 @@ def app():
             if asset_id:
                 with st.expander("Customize band combination and color palette", True):
                     try:
-                        col = ee.ImageCollection.load(asset_id)
+                        metadata = get_asset_metadata().get(asset_id)
                         st.session_state["ee_asset_id"] = asset_id
-                    except:
+                    except ee.EEException:
                         st.error("Invalid Earth Engine asset ID.")
                         st.session_state["ee_asset_id"] = None
                         return
 
-                    img_bands = col.first().bandNames().getInfo()
+                    st.caption(describe_asset(metadata))
+                    img_bands = metadata["bands"]
                     if len(img_bands) >= 3:
                         default_bands = img_bands[:3][::-1]
                     else:
@@ -301,9 +444,7 @@ def app():
                             "Enter a custom palette:",
                             palette_values,
                         )
-                        st.write(
-                            cm.plot_colormap(cmap=palette_options, return_fig=True)
-                        )
+                        st.image(cm.preview(palette_options), use_column_width=True)
                         st.session_state["palette"] = json.loads(
                             palette.replace("'", '"')
                         )
@@ -362,7 +503,7 @@ def app():
                 "Enter a custom palette:",
                 palette_values,
             )
-            st.write(cm.plot_colormap(cmap=palette_options, return_fig=True))
+            st.image(cm.preview(palette_options), use_column_width=True)
             st.session_state["palette"] = json.loads(palette.replace("'", '"'))
         
         elif collection == "MODIS Ocean Color SMI":
@@ -421,7 +562,7 @@ def app():
                 "Enter a custom palette:",
                 palette_values,
             )
-            st.write(cm.plot_colormap(cmap=palette_options, return_fig=True))
+            st.image(cm.preview(palette_options), use_column_width=True)
             st.session_state["palette"] = json.loads(palette.replace("'", '"'))
 
         sample_roi = st.selectbox(
@@ -442,7 +583,6 @@ def app():
                     "User-defined": None,
                     "Continents": "continents",
                     "Countries": "countries",
-                    "India": "india"
                 }
 
                 overlay = st.selectbox(
@@ -552,6 +692,7 @@ def app():
                 )
             try:
                 st.session_state["roi"] = geemap.gdf_to_ee(gdf, geodesic=False)
+                st.session_state["roi_geojson"] = gdf_to_geojson(gdf)
             except Exception as e:
                 st.error(e)
                 st.error("Please draw another ROI and try again.")
@@ -562,6 +703,7 @@ def app():
             gdf = uploaded_file_to_gdf(data)
             try:
                 st.session_state["roi"] = geemap.gdf_to_ee(gdf, geodesic=False)
+                st.session_state["roi_geojson"] = gdf_to_geojson(gdf)
                 m.add_gdf(gdf, "ROI")
             except Exception as e:
                 st.error(e)
@@ -589,10 +731,7 @@ def app():
 
             with st.form("submit_landsat_form"):
 
-                roi = None
-                if st.session_state.get("roi") is not None:
-                    roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                roi = st.session_state.get("roi_geojson")
 
                 title = st.text_input(
                     "Enter a title to show on the timelapse: ", timelapse_title
@@ -626,7 +765,11 @@ def app():
 
                     speed = st.slider("Frames per second:", 1, 30, timelapse_speed)
                     dimensions = st.slider(
-                        "Maximum dimensions (Width*Height) in pixels", 768, 2000, 768
+                        "Maximum dimensions (Width*Height) in pixels",
+                        768,
+                        4096,
+                        768,
+                        help="Frames larger than 2048 pixels are fetched as tiles and mosaicked.",
                     )
                     progress_bar_color = st.color_picker(
                         "Progress bar color:", "#0000ff"
@@ -652,6 +795,7 @@ def app():
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    renditions = renditions_checkbox()
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -674,76 +818,44 @@ def app():
                         end_date = str(months[1]).zfill(2) + "-30"
                         bands = RGB.split("/")
 
+                        spec = build_spec(
+                            collection,
+                            roi,
+                            start_year=start_year,
+                            end_year=end_year,
+                            start_date=start_date,
+                            end_date=end_date,
+                            bands=bands,
+                            apply_fmask=apply_fmask,
+                            frames_per_second=speed,
+                            dimensions=dimensions,
+                            overlay_data=overlay_data,
+                            overlay_color=overlay_color,
+                            overlay_width=overlay_width,
+                            overlay_opacity=overlay_opacity,
+                            frequency=frequency,
+                            date_format=None,
+                            title=title,
+                            title_xy=("2%", "90%"),
+                            add_text=True,
+                            text_xy=("2%", "2%"),
+                            text_sequence=None,
+                            font_type=font_type,
+                            font_size=font_size,
+                            font_color=font_color,
+                            add_progress_bar=True,
+                            progress_bar_color=progress_bar_color,
+                            progress_bar_height=5,
+                            loop=0,
+                            mp4=mp4,
+                            fading=fading,
+                            renditions=renditions,
+                        )
+                        if not preflight(spec, empty_text):
+                            st.stop()
                         try:
-                            if collection == "Landsat TM-ETM-OLI Surface Reflectance":
-                                out_gif = geemap.landsat_timelapse(
-                                    roi=roi,
-                                    out_gif=out_gif,
-                                    start_year=start_year,
-                                    end_year=end_year,
-                                    start_date=start_date,
-                                    end_date=end_date,
-                                    bands=bands,
-                                    apply_fmask=apply_fmask,
-                                    frames_per_second=speed,
-                                    # dimensions=dimensions,
-                                    dimensions=768,
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    frequency=frequency,
-                                    date_format=None,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=True,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                            elif collection == "Sentinel-2 MSI Surface Reflectance":
-                                out_gif = geemap.sentinel2_timelapse(
-                                    roi=roi,
-                                    out_gif=out_gif,
-                                    start_year=start_year,
-                                    end_year=end_year,
-                                    start_date=start_date,
-                                    end_date=end_date,
-                                    bands=bands,
-                                    apply_fmask=apply_fmask,
-                                    frames_per_second=speed,
-                                    dimensions=768,
-                                    # dimensions=dimensions,
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    frequency=frequency,
-                                    date_format=None,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=True,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                        except:
+                            out_gif, out_mp4 = run_job(spec, empty_text)
+                        except Exception:
                             empty_text.error(
                                 "An error occurred while computing the timelapse. Your probably requested too much data. Try reducing the ROI or timespan."
                             )
@@ -756,13 +868,12 @@ def app():
                             # )
                             # empty_image.image(out_gif)
 
-                            out_mp4 = out_gif.replace(".gif", ".mp4")
-                            if mp4 and os.path.exists(out_mp4):
+                            if out_mp4 is not None:
                                 with empty_video:
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    show_video(out_gif, out_mp4)
 
                         else:
                             empty_text.error(
@@ -775,10 +886,7 @@ def app():
 
             with st.form("submit_goes_form"):
 
-                roi = None
-                if st.session_state.get("roi") is not None:
-                    roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                roi = st.session_state.get("roi_geojson")
 
                 satellite = st.selectbox("Select a satellite:", ["GOES-17", "GOES-16"])
                 earliest_date = datetime.date(2017, 7, 10)
@@ -844,6 +952,7 @@ def app():
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    renditions = renditions_checkbox()
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -860,9 +969,9 @@ def app():
                     else:
                         empty_text.text("Computing... Please wait...")
 
-                        geemap.goes_timelapse(
+                        spec = build_spec(
+                            collection,
                             roi,
-                            out_gif,
                             start_date=start,
                             end_date=end,
                             data=satellite,
@@ -885,49 +994,30 @@ def app():
                             overlay_opacity=overlay_opacity,
                             mp4=mp4,
                             fading=fading,
+                            renditions=renditions,
+                            fire=add_fire,
                         )
+                        if not preflight(spec, empty_text):
+                            st.stop()
+                        out_gif, out_mp4 = run_job(spec, empty_text)
 
                         if out_gif is not None and os.path.exists(out_gif):
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            empty_image.image(artifact(out_gif))
 
-                            out_mp4 = out_gif.replace(".gif", ".mp4")
-                            if mp4 and os.path.exists(out_mp4):
+                            if out_mp4 is not None:
                                 with empty_video:
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    show_video(out_gif, out_mp4)
 
-                            if add_fire:
-                                out_fire_gif = geemap.temp_file_path(".gif")
-                                empty_fire_text.text(
-                                    "Delineating Fire Hotspot... Please wait..."
-                                )
-                                geemap.goes_fire_timelapse(
-                                    out_fire_gif,
-                                    start_date=start,
-                                    end_date=end,
-                                    data=satellite,
-                                    scan=scan_type.replace(" ", "_").lower(),
-                                    region=roi,
-                                    dimensions=768,
-                                    framesPerSecond=speed,
-                                    date_format="YYYY-MM-dd HH:mm",
-                                    xy=("3%", "3%"),
-                                    text_sequence=None,
-                                    font_type="arial.ttf",
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=add_progress_bar,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    loop=0,
-                                )
-                                if os.path.exists(out_fire_gif):
-                                    empty_fire_image.image(out_fire_gif)
+                            out_fire_gif = fire_path(out_gif)
+                            if add_fire and os.path.exists(out_fire_gif):
+                                empty_fire_text.text("Fire Hotspot👇")
+                                empty_fire_image.image(artifact(out_fire_gif))
                         else:
                             empty_text.text(
                                 "Something went wrong, either the ROI is too big or there are no data available for the specified date range. Please try a smaller ROI or different date range."
@@ -942,10 +1032,7 @@ def app():
 
             with st.form("submit_modis_form"):
 
-                roi = None
-                if st.session_state.get("roi") is not None:
-                    roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                roi = st.session_state.get("roi_geojson")
 
                 with st.expander("Customize timelapse"):
 
@@ -974,6 +1061,7 @@ def app():
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    renditions = renditions_checkbox()
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -989,37 +1077,38 @@ def app():
 
                         empty_text.text("Computing... Please wait...")
 
-                        geemap.modis_ndvi_timelapse(
+                        spec = build_spec(
+                            collection,
                             roi,
-                            out_gif,
-                            satellite,
-                            band,
-                            start_date,
-                            end_date,
-                            768,
-                            speed,
+                            data=satellite,
+                            band=band,
+                            start_date=start_date,
+                            end_date=end_date,
+                            dimensions=768,
+                            framesPerSecond=speed,
                             overlay_data=overlay_data,
                             overlay_color=overlay_color,
                             overlay_width=overlay_width,
                             overlay_opacity=overlay_opacity,
                             mp4=mp4,
                             fading=fading,
+                            renditions=renditions,
                         )
-
-                        geemap.reduce_gif_size(out_gif)
+                        if not preflight(spec, empty_text):
+                            st.stop()
+                        out_gif, out_mp4 = run_job(spec, empty_text)
 
                         empty_text.text(
                             "Right click the GIF to save it to your computer👇"
                         )
-                        empty_image.image(out_gif)
+                        empty_image.image(artifact(out_gif))
 
-                        out_mp4 = out_gif.replace(".gif", ".mp4")
-                        if mp4 and os.path.exists(out_mp4):
+                        if out_mp4 is not None:
                             with empty_video:
                                 st.text(
                                     "Right click the MP4 to save it to your computer👇"
                                 )
-                                st.video(out_gif.replace(".gif", ".mp4"))
+                                show_video(out_gif, out_mp4)
 
         elif collection == "Any Earth Engine ImageCollection":
 
@@ -1085,10 +1174,7 @@ def app():
                 empty_video = st.container()
                 empty_fire_image = st.empty()
 
-                roi = None
-                if st.session_state.get("roi") is not None:
-                    roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                roi = st.session_state.get("roi_geojson")
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
@@ -1100,58 +1186,62 @@ def app():
                     else:
 
                         empty_text.text("Computing... Please wait...")
+                        spec = build_spec(
+                            collection,
+                            roi,
+                            collection=st.session_state.get("ee_asset_id"),
+                            start_date=start_date.strftime("%Y-%m-%d"),
+                            end_date=end_date.strftime("%Y-%m-%d"),
+                            frequency=frequency,
+                            reducer=reducer,
+                            date_format=data_format,
+                            bands=st.session_state.get("bands"),
+                            palette=st.session_state.get("palette"),
+                            vis_params=st.session_state.get("vis_params"),
+                            dimensions=768,
+                            frames_per_second=speed,
+                            crs="EPSG:3857",
+                            overlay_data=overlay_data,
+                            overlay_color=overlay_color,
+                            overlay_width=overlay_width,
+                            overlay_opacity=overlay_opacity,
+                            title=title,
+                            title_xy=("2%", "90%"),
+                            add_text=True,
+                            text_xy=("2%", "2%"),
+                            text_sequence=None,
+                            font_type=font_type,
+                            font_size=font_size,
+                            font_color=font_color,
+                            add_progress_bar=add_progress_bar,
+                            progress_bar_color=progress_bar_color,
+                            progress_bar_height=5,
+                            loop=0,
+                            mp4=mp4,
+                            fading=fading,
+                        )
+                        if not preflight(spec, empty_text):
+                            st.stop()
                         try:
-                            geemap.create_timelapse(
-                                st.session_state.get("ee_asset_id"),
-                                start_date=start_date.strftime("%Y-%m-%d"),
-                                end_date=end_date.strftime("%Y-%m-%d"),
-                                region=roi,
-                                frequency=frequency,
-                                reducer=reducer,
-                                date_format=data_format,
-                                out_gif=out_gif,
-                                bands=st.session_state.get("bands"),
-                                palette=st.session_state.get("palette"),
-                                vis_params=st.session_state.get("vis_params"),
-                                dimensions=768,
-                                frames_per_second=speed,
-                                crs="EPSG:3857",
-                                overlay_data=overlay_data,
-                                overlay_color=overlay_color,
-                                overlay_width=overlay_width,
-                                overlay_opacity=overlay_opacity,
-                                title=title,
-                                title_xy=("2%", "90%"),
-                                add_text=True,
-                                text_xy=("2%", "2%"),
-                                text_sequence=None,
-                                font_type=font_type,
-                                font_size=font_size,
-                                font_color=font_color,
-                                add_progress_bar=add_progress_bar,
-                                progress_bar_color=progress_bar_color,
-                                progress_bar_height=5,
-                                loop=0,
-                                mp4=mp4,
-                                fading=fading,
-                            )
-                        except:
+                            out_gif, out_mp4 = run_job(spec, empty_text)
+                        except Exception:
+                            out_gif, out_mp4 = None, None
                             empty_text.error(
                                 "An error occurred while computing the timelapse. You probably requested too much data. Try reducing the ROI or timespan."
                             )
 
-                        empty_text.text(
-                            "Right click the GIF to save it to your computer👇"
-                        )
-                        empty_image.image(out_gif)
+                        if out_gif is not None:
+                            empty_text.text(
+                                "Right click the GIF to save it to your computer👇"
+                            )
+                            empty_image.image(artifact(out_gif))
 
-                        out_mp4 = out_gif.replace(".gif", ".mp4")
-                        if mp4 and os.path.exists(out_mp4):
+                        if out_mp4 is not None:
                             with empty_video:
                                 st.text(
                                     "Right click the MP4 to save it to your computer👇"
                                 )
-                                st.video(out_gif.replace(".gif", ".mp4"))
+                                st.video(artifact(out_mp4))
 
         elif collection in [
             "MODIS Gap filled Land Surface Temperature Daily",
@@ -1213,10 +1303,7 @@ def app():
                 empty_image = st.empty()
                 empty_video = st.container()
 
-                roi = None
-                if st.session_state.get("roi") is not None:
-                    roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                roi = st.session_state.get("roi_geojson")
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
@@ -1228,113 +1315,80 @@ def app():
                     else:
 
                         empty_text.text("Computing... Please wait...")
+                        if collection == "MODIS Ocean Color SMI":
+                            if vis_params.startswith("{") and vis_params.endswith("}"):
+                                vis_params = json.loads(vis_params.replace("'", '"'))
+                            else:
+                                vis_params = None
+                            source = {
+                                "satellite": st.session_state.get("ee_asset_id"),
+                                "bands": st.session_state["band"],
+                            }
+                        else:
+                            vis_params = None
+                            source = {
+                                "collection": st.session_state.get("ee_asset_id"),
+                                "bands": None,
+                            }
+
+                        spec = build_spec(
+                            collection,
+                            roi,
+                            start_date=start_date.strftime("%Y-%m-%d"),
+                            end_date=end_date.strftime("%Y-%m-%d"),
+                            frequency=frequency,
+                            reducer=reducer,
+                            date_format=None,
+                            palette=st.session_state.get("palette"),
+                            vis_params=vis_params,
+                            dimensions=768,
+                            frames_per_second=speed,
+                            crs="EPSG:3857",
+                            overlay_data=overlay_data,
+                            overlay_color=overlay_color,
+                            overlay_width=overlay_width,
+                            overlay_opacity=overlay_opacity,
+                            title=title,
+                            title_xy=("2%", "90%"),
+                            add_text=True,
+                            text_xy=("2%", "2%"),
+                            text_sequence=None,
+                            font_type=font_type,
+                            font_size=font_size,
+                            font_color=font_color,
+                            add_progress_bar=add_progress_bar,
+                            progress_bar_color=progress_bar_color,
+                            progress_bar_height=5,
+                            add_colorbar=add_colorbar,
+                            colorbar_label=colorbar_label,
+                            loop=0,
+                            mp4=mp4,
+                            fading=fading,
+                            **source,
+                        )
+                        if not preflight(spec, empty_text):
+                            st.stop()
                         try:
-                            if (
-                                collection
-                                == "MODIS Gap filled Land Surface Temperature Daily"
-                            ):
-                                out_gif = geemap.create_timelapse(
-                                    st.session_state.get("ee_asset_id"),
-                                    start_date=start_date.strftime("%Y-%m-%d"),
-                                    end_date=end_date.strftime("%Y-%m-%d"),
-                                    region=roi,
-                                    bands=None,
-                                    frequency=frequency,
-                                    reducer=reducer,
-                                    date_format=None,
-                                    out_gif=out_gif,
-                                    palette=st.session_state.get("palette"),
-                                    vis_params=None,
-                                    dimensions=768,
-                                    frames_per_second=speed,
-                                    crs="EPSG:3857",
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=add_progress_bar,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    add_colorbar=add_colorbar,
-                                    colorbar_label=colorbar_label,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                            elif collection == "MODIS Ocean Color SMI":
-                                if vis_params.startswith("{") and vis_params.endswith(
-                                    "}"
-                                ):
-                                    vis_params = json.loads(
-                                        vis_params.replace("'", '"')
-                                    )
-                                else:
-                                    vis_params = None
-                                out_gif = geemap.modis_ocean_color_timelapse(
-                                    st.session_state.get("ee_asset_id"),
-                                    start_date=start_date.strftime("%Y-%m-%d"),
-                                    end_date=end_date.strftime("%Y-%m-%d"),
-                                    region=roi,
-                                    bands=st.session_state["band"],
-                                    frequency=frequency,
-                                    reducer=reducer,
-                                    date_format=None,
-                                    out_gif=out_gif,
-                                    palette=st.session_state.get("palette"),
-                                    vis_params=vis_params,
-                                    dimensions=768,
-                                    frames_per_second=speed,
-                                    crs="EPSG:3857",
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=add_progress_bar,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    add_colorbar=add_colorbar,
-                                    colorbar_label=colorbar_label,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                        except:
+                            out_gif, out_mp4 = run_job(spec, empty_text)
+                        except Exception:
+                            out_gif, out_mp4 = None, None
                             empty_text.error(
                                 "Something went wrong. You probably requested too much data. Try reducing the ROI or timespan."
                             )
 
                         if out_gif is not None and os.path.exists(out_gif):
 
-                            geemap.reduce_gif_size(out_gif)
-
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            empty_image.image(artifact(out_gif))
 
-                            out_mp4 = out_gif.replace(".gif", ".mp4")
-                            if mp4 and os.path.exists(out_mp4):
+                            if out_mp4 is not None:
                                 with empty_video:
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    st.video(artifact(out_mp4))
 
                         else:
                             st.error(
@@ -1383,10 +1437,7 @@ def app():
                 empty_video = st.container()
                 empty_fire_image = st.empty()
 
-                roi = None
-                if st.session_state.get("roi") is not None:
-                    roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                roi = st.session_state.get("roi_geojson")
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
@@ -1398,38 +1449,42 @@ def app():
                     else:
 
                         empty_text.text("Computing... Please wait...")
+                        spec = build_spec(
+                            collection,
+                            roi,
+                            start_year=years[0],
+                            end_year=years[1],
+                            bands=bands.split("/"),
+                            palette=st.session_state.get("palette"),
+                            vis_params=None,
+                            dimensions=768,
+                            frames_per_second=speed,
+                            crs="EPSG:3857",
+                            overlay_data=overlay_data,
+                            overlay_color=overlay_color,
+                            overlay_width=overlay_width,
+                            overlay_opacity=overlay_opacity,
+                            title=title,
+                            title_xy=("2%", "90%"),
+                            add_text=True,
+                            text_xy=("2%", "2%"),
+                            text_sequence=None,
+                            font_type=font_type,
+                            font_size=font_size,
+                            font_color=font_color,
+                            add_progress_bar=add_progress_bar,
+                            progress_bar_color=progress_bar_color,
+                            progress_bar_height=5,
+                            loop=0,
+                            mp4=mp4,
+                            fading=fading,
+                        )
+                        if not preflight(spec, empty_text):
+                            st.stop()
                         try:
-                            geemap.naip_timelapse(
-                                roi,
-                                years[0],
-                                years[1],
-                                out_gif,
-                                bands=bands.split("/"),
-                                palette=st.session_state.get("palette"),
-                                vis_params=None,
-                                dimensions=768,
-                                frames_per_second=speed,
-                                crs="EPSG:3857",
-                                overlay_data=overlay_data,
-                                overlay_color=overlay_color,
-                                overlay_width=overlay_width,
-                                overlay_opacity=overlay_opacity,
-                                title=title,
-                                title_xy=("2%", "90%"),
-                                add_text=True,
-                                text_xy=("2%", "2%"),
-                                text_sequence=None,
-                                font_type=font_type,
-                                font_size=font_size,
-                                font_color=font_color,
-                                add_progress_bar=add_progress_bar,
-                                progress_bar_color=progress_bar_color,
-                                progress_bar_height=5,
-                                loop=0,
-                                mp4=mp4,
-                                fading=fading,
-                            )
-                        except:
+                            out_gif, out_mp4 = run_job(spec, empty_text)
+                        except Exception:
+                            out_gif, out_mp4 = None, None
                             empty_text.error(
                                 "Something went wrong. You either requested too much data or the ROI is outside the U.S."
                             )
@@ -1439,21 +1494,42 @@ def app():
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            empty_image.image(artifact(out_gif))
 
-                            out_mp4 = out_gif.replace(".gif", ".mp4")
-                            if mp4 and os.path.exists(out_mp4):
+                            if out_mp4 is not None:
                                 with empty_video:
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    st.video(artifact(out_mp4))
 
                         else:
                             st.error(
                                 "Something went wrong. You either requested too much data or the ROI is outside the U.S."
                             )
 
+        # A widget change interrupts the polling loop but not the job itself,
+        # so pick up the pending job on the next rerun.
+        if st.session_state.get("timelapse_job") is not None:
+            empty_text = st.empty()
+            try:
+                out_gif, out_mp4 = wait_for_job(
+                    st.session_state["timelapse_job"], empty_text
+                )
+            except RuntimeError:
+                empty_text.error(
+                    "Something went wrong. You probably requested too much data. Try reducing the ROI or timespan."
+                )
+            else:
+                empty_text.text("Right click the GIF to save it to your computer👇")
+                st.image(artifact(out_gif))
+                if out_mp4 is not None:
+                    show_video(out_gif, out_mp4)
+
+        # The slider lives outside the forms so scrubbing survives reruns.
+        if st.session_state.get("timelapse_gif") is not None:
+            show_frame_scrubber(st.session_state["timelapse_gif"])
+
 
 try:
     app()
@@ -1,12 +1,13 @@
 import streamlit as st
 import geemap.foliumap as geemap
 import ee
+from utils.ee_session import require_earth_engine
 
 def app():
     st.title('Split Map of Land Cover Changes')
 
     # Initialize the Earth Engine module
-    ee.Initialize(project='lulc-429712')
+    require_earth_engine()
 
     # Define available years
     years = [str(year) for year in range(2001, 2022, 2)]
@@ -1,12 +1,13 @@
 import streamlit as st
 import geemap.foliumap as geemap
 import ee
+from utils.ee_session import require_earth_engine
 
 def app():
     st.title('Global Forest Cover Loss 🌳')
 
     # Initialize the Earth Engine module
-    ee.Initialize(project='lulc-429712')
+    require_earth_engine()
 
     # Initialize the map
     m = geemap.Map(center=(22.5937, 78.9629), zoom=4, height=600)
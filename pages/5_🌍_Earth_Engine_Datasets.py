@@ -2,8 +2,23 @@ import ee
 import json
 import streamlit as st
 import geemap.foliumap as geemap
+from utils.assets import AssetMetadata, describe
+from utils.catalog import CatalogIndex
+from utils.ee_session import require_earth_engine
 
 st.set_page_config(layout="wide")
+require_earth_engine()
+
+
+@st.cache_resource
+def get_catalog():
+    return CatalogIndex()
+
+
+@st.cache_resource
+def get_asset_metadata():
+    return AssetMetadata()
+
 
 def nlcd():
 
@@ -67,7 +82,7 @@ def search_data():
     with col2:
         keyword = st.text_input("Enter a keyword to search (e.g., elevation)", "")
         if keyword:
-            ee_assets = geemap.search_ee_data(keyword)
+            ee_assets = get_catalog().search(keyword)
             asset_titles = [x["title"] for x in ee_assets]
             asset_types = [x["type"] for x in ee_assets]
 
@@ -94,6 +109,13 @@ def search_data():
                 ee_id = ee_assets[index]["id"]
                 uid = ee_assets[index]["uid"]
                 st.markdown(f"""**Earth Engine Snippet:** `{ee_id}`""")
+                if asset_types[index] in ("image", "image_collection"):
+                    try:
+                        metadata = get_asset_metadata().get(ee_id, asset_types[index])
+                        st.markdown(f"**Bands:** {', '.join(metadata['bands'])}")
+                        st.caption(describe(metadata))
+                    except ee.EEException as e:
+                        st.warning(f"Could not load asset metadata: {e}")
                 ee_asset = f"{translate[asset_types[index]]}{ee_id}')"
 
                 if ee_asset.startswith("ee.ImageCollection"):
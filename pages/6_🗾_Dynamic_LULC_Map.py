@@ -1,13 +1,22 @@
 import streamlit as st
-import ee
 import folium
+import pandas as pd
 from streamlit_folium import folium_static
-
-# Authenticate the Google Earth Engine account
-ee.Authenticate()  
-
-# Initialize the Earth Engine API
-ee.Initialize(project='lulc-429712')
+from utils import local_classification
+from utils.ee_session import require_earth_engine
+from utils.classification import (
+    BANDS,
+    CLASSIFIERS,
+    EARTH_ENGINE,
+    LOCAL,
+    ClassificationCache,
+    classification_key,
+    compare,
+    roi_bounds,
+)
+
+# Initialize Earth Engine once per process
+require_earth_engine()
 
 # Streamlit app
 st.title("Land Use Land Cover Classification Map")
@@ -19,91 +28,60 @@ center_lon = st.sidebar.number_input("Center Longitude", value=73.2626, format="
 box_size = st.sidebar.slider("Box Size (in degrees)", min_value=0.01, max_value=1.0, value=0.1)
 
 # Classifier dropdown
-classifier_choice = st.sidebar.selectbox("Choose Classifier", 
-                                         ["Random Forest", "KNN", "Gradient Tree Boost", "SVM", "Decision Tree"])
-
-# Calculate the bounding box coordinates
-half_size = box_size / 2
-ul_lat = center_lat + half_size  # Upper-left latitude
-ul_lon = center_lon - half_size  # Upper-left longitude
-lr_lat = center_lat - half_size  # Lower-right latitude
-lr_lon = center_lon + half_size  # Lower-right longitude
-
-# Define ROI using the bounding box
-roi = ee.Geometry.Rectangle([ul_lon, lr_lat, lr_lon, ul_lat])
-
-# Load Landsat 8 Collection 2 data and select relevant bands
-image = ee.ImageCollection('LANDSAT/LC08/C02/T1_L2') \
-    .filterBounds(roi) \
-    .filterDate('2023-01-01', '2023-12-31') \
-    .sort('CLOUD_COVER') \
-    .first()
-
-# Select bands for classification
-bands = ['SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7']
-
-# Load ESRI Land Cover data to use as labels
-lc = ee.ImageCollection("projects/sat-io/open-datasets/landcover/ESRI_Global-LULC_10m").mosaic().clip(roi)
-
-# Create a sample from the image with the land cover as labels
-label = 'b1'  # Assuming 'b1' corresponds to the label in the ESRI dataset
-sample = image.select(bands).addBands(lc.select(label)).sample(**{
-    'region': roi,
-    'numPixels': 1000,
-    'seed': 0,
-})
-
-# Split the sample into training and validation sets
-sample = sample.randomColumn('random')
-trainingSample = sample.filter(ee.Filter.lte('random', 0.8))
-validationSample = sample.filter(ee.Filter.gt('random', 0.8))
-
-# Function to classify the image without showing accuracy
-def classify_image(classifier_type):
-    if classifier_type == "Random Forest":
-        classifier = ee.Classifier.smileRandomForest(50).train(
-            features=trainingSample,
-            classProperty=label,
-            inputProperties=bands
-        )
-    elif classifier_type == "KNN":
-        classifier = ee.Classifier.smileKNN(100).train(
-            features=trainingSample,
-            classProperty=label,
-            inputProperties=bands
-        )
-    elif classifier_type == "SVM":
-        classifier = ee.Classifier.libsvm().train(
-            features=trainingSample,
-            classProperty=label,
-            inputProperties=bands
-        )
-    elif classifier_type == "Decision Tree":
-        classifier = ee.Classifier.smileCart().train(
-            features=trainingSample,
-            classProperty=label,
-            inputProperties=bands
-        )
-    else:  # Gradient Tree Boost
-        classifier = ee.Classifier.smileGradientTreeBoost(50).train(
-            features=trainingSample,
-            classProperty=label,
-            inputProperties=bands
-        )
-        
-    # Classify the image
-    classified = image.select(bands).classify(classifier)
-    
-    return classified
-
-# Classify the image based on user selection
-classified_image = classify_image(classifier_choice)
-
-# Define a method for displaying Earth Engine Image tiles on a folium map
-def add_ee_layer(self, ee_image_object, vis_params, name):
-    map_id_dict = ee.Image(ee_image_object).getMapId(vis_params)  # Converts Earth engine object to image if not converted.
+classifier_choice = st.sidebar.selectbox("Choose Classifier", list(CLASSIFIERS))
+
+# Training sample drawn from the ESRI land cover labels
+num_pixels = st.sidebar.number_input("Sample size (pixels)", min_value=100, max_value=10000, value=1000, step=100)
+seed = st.sidebar.number_input("Sample seed", min_value=0, value=0, step=1)
+
+# The local engine downloads the ROI once and classifies it with scikit-learn
+engines = [EARTH_ENGINE] + ([LOCAL] if local_classification.available() else [])
+engine = st.sidebar.radio("Classification engine", engines)
+if engine == LOCAL and box_size > local_classification.LOCAL_MAX_BOX:
+    box_size = local_classification.LOCAL_MAX_BOX
+    st.sidebar.warning(f"The local engine classifies boxes up to {box_size} degrees.")
+
+# Train every classifier on the same sample and score them on the validation split
+compare_all = st.sidebar.checkbox("Compare all classifiers")
+
+
+# Visualization parameters for the classified image
+legend_dict = {
+    "names": ["Water", "Trees", "Grass", "Flooded Vegetation", "Crops", "Scrub/Shrub", "Built-up", "Bare Ground", "Snow/Ice", "Clouds"],
+    "colors": ["#1A5BAB", "#358221", "#A7D282", "#87D19E", "#FFDB5C", "#EECFA8", "#ED022A", "#EDE9E4", "#F2FAFF", "#C8C8C8"]
+}
+
+vis_params = {
+    'min': 1,
+    'max': 10,
+    'palette': legend_dict['colors']
+}
+
+
+# Trained classifiers and their tiles are shared by all sessions, so a rerun
+# that only pans the map or revisits an ROI makes no Earth Engine request.
+@st.cache_resource
+def get_classification_cache():
+    return ClassificationCache()
+
+
+key = classification_key(
+    center_lat,
+    center_lon,
+    box_size,
+    classifier_choice,
+    bands=BANDS,
+    num_pixels=num_pixels,
+    seed=seed,
+    engine=engine,
+)
+with st.spinner("Classifying..."):
+    classification = get_classification_cache().get(key, vis_params)
+
+# Define a method for displaying tiles on a folium map
+def add_tile_layer(self, tile_url, name):
     folium.raster_layers.TileLayer(
-        tiles=map_id_dict['tile_fetcher'].url_format,
+        tiles=tile_url,
         attr='Map Data &copy; <a href="https://earthengine.google.com/">Google Earth Engine</a>',
         name=name,
         overlay=True,  # Means that will overlay that layer over the map
@@ -111,7 +89,7 @@ def add_ee_layer(self, ee_image_object, vis_params, name):
     ).add_to(self)  # Adds the layer to folium map.
 
 # Add the method to the folium Map object
-folium.Map.add_ee_layer = add_ee_layer
+folium.Map.add_tile_layer = add_tile_layer
 
 # Create a folium map centered on the ROI
 Map = folium.Map(location=[center_lat, center_lon], zoom_start=8)
@@ -133,20 +111,16 @@ folium.TileLayer(
     control=True  # Means this will be included in control panel to allow to switch b/w different basemaps
 ).add_to(Map)
 
-# Visualization parameters for the classified image
-legend_dict = {
-    "names": ["Water", "Trees", "Grass", "Flooded Vegetation", "Crops", "Scrub/Shrub", "Built-up", "Bare Ground", "Snow/Ice", "Clouds"],
-    "colors": ["#1A5BAB", "#358221", "#A7D282", "#87D19E", "#FFDB5C", "#EECFA8", "#ED022A", "#EDE9E4", "#F2FAFF", "#C8C8C8"]
-}
-
-vis_params = {
-    'min': 1,
-    'max': 10,
-    'palette': legend_dict['colors']
-}
-
 # Add the classified image to the map
-Map.add_ee_layer(classified_image, vis_params, 'Land Cover Classification')
+if classification.tile_url is not None:
+    Map.add_tile_layer(classification.tile_url, 'Land Cover Classification')
+else:
+    west, south, east, north = roi_bounds(center_lat, center_lon, box_size)
+    folium.raster_layers.ImageOverlay(
+        image=classification.image,
+        bounds=[[south, west], [north, east]],
+        name='Land Cover Classification',
+    ).add_to(Map)
 
 # Create a legend for the land cover types
 legend_html = '''
@@ -175,6 +149,45 @@ folium.LayerControl().add_to(Map)
 # Render the map in Streamlit
 folium_static(Map)
 
+
+@st.cache_data(show_spinner=False, ttl=2 * 3600)
+def run_comparison(key):
+    return compare(key)
+
+
+def class_name(value):
+    if 1 <= value <= len(legend_dict["names"]):
+        return legend_dict["names"][value - 1]
+    return str(value)
+
+
+if compare_all:
+    st.markdown("### Classifier comparison")
+    with st.spinner("Training all classifiers..."):
+        evaluations = run_comparison(key)
+    st.dataframe(
+        pd.DataFrame(
+            [
+                {
+                    "Classifier": e.classifier,
+                    "Train and validate (s)": round(e.seconds, 2),
+                    "Overall accuracy": round(e.accuracy, 3),
+                    "Kappa": round(e.kappa, 3),
+                }
+                for e in evaluations
+            ]
+        ).set_index("Classifier")
+    )
+    for e in evaluations:
+        with st.expander(f"Confusion matrix: {e.classifier}"):
+            # Rows are the ESRI labels, columns the predicted classes.
+            matrix = pd.DataFrame(e.matrix)
+            present = matrix.index[(matrix.sum(axis=0) + matrix.sum(axis=1)) > 0]
+            matrix = matrix.loc[present, present]
+            matrix.index = [class_name(v) for v in present]
+            matrix.columns = [class_name(v) for v in present]
+            st.dataframe(matrix)
+
 # Add Layer Control to the map
 folium.LayerControl().add_to(Map)
 
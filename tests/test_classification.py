@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("ee")
+
+from utils import classification  # noqa: E402
+from utils.classification import (  # noqa: E402
+    Classification,
+    ClassificationCache,
+    classification_key,
+    scores,
+)
+
+
+def test_perfect_agreement():
+    assert scores([[5, 0], [0, 5]]) == (1.0, 1.0)
+
+
+def test_chance_agreement_has_no_kappa():
+    assert scores([[25, 25], [25, 25]]) == (0.5, 0.0)
+
+
+def test_accuracy_and_kappa_of_a_matrix():
+    # 35 of 50 agree; rows and columns are evenly split, so chance is 0.5.
+    accuracy, kappa = scores([[20, 5], [10, 15]])
+    assert accuracy == pytest.approx(0.7)
+    assert kappa == pytest.approx(0.4)
+
+
+def test_empty_matrix():
+    assert scores([[0, 0], [0, 0]]) == (0.0, 0.0)
+
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Count classify calls and control the time entries are created and read."""
+    now = [1000.0]
+    computed = []
+
+    def classify(key, vis_params):
+        computed.append(key)
+        return Classification(key[3], None, "url", now[0])
+
+    monkeypatch.setattr(classification, "classify", classify)
+    monkeypatch.setattr(classification.time, "time", lambda: now[0])
+    return now, computed
+
+
+def test_cache_reuses_entries_until_they_expire(clock):
+    now, computed = clock
+    cache = ClassificationCache(ttl=60)
+    vis = {"min": 1, "max": 10}
+    key = classification_key(18.2335, 73.2626, 0.1, "KNN")
+    assert cache.get(key, vis) is cache.get(key, vis)
+    # The center is rounded to the two decimals the page shows.
+    cache.get(classification_key(18.2331, 73.2629, 0.1, "KNN"), vis)
+    assert computed == [key]
+    assert (cache.hits, cache.misses) == (2, 1)
+    now[0] += 61
+    cache.get(key, vis)
+    assert len(computed) == 2
+
+
+def test_cache_evicts_least_recently_used(clock):
+    _, computed = clock
+    cache = ClassificationCache(max_entries=2)
+    names = ("KNN", "SVM", "Decision Tree")
+    knn, svm, tree = (classification_key(18.0, 73.0, 0.1, name) for name in names)
+    for key in (knn, svm, knn, tree, knn, svm):
+        cache.get(key, {})
+    assert computed == [knn, svm, tree, svm]
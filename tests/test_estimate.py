@@ -0,0 +1,67 @@
+from utils import estimate as estimates
+from utils.collections import LANDSAT, MODIS_LST
+from utils.estimate import MAX_REQUEST_BYTES, MAX_SECONDS, MAX_TOTAL_BYTES, estimate
+
+ROI = {
+    "type": "Polygon",
+    "coordinates": [[[72.0, 18.0], [74.5, 18.0], [74.5, 19.5], [72.0, 18.0]]],
+}
+LANDSAT_PARAMS = {
+    "start_year": 2000,
+    "end_year": 2020,
+    "start_date": "06-10",
+    "end_date": "09-20",
+    "frequency": "year",
+}
+
+
+def spec(collection, roi=ROI, **params):
+    return {"collection": collection, "roi": roi, "reduce_gif": False, "params": params}
+
+
+def test_no_estimate_without_roi():
+    assert estimate(spec(LANDSAT, roi=None, **LANDSAT_PARAMS)) is None
+
+
+def test_tiled_frames_stay_within_the_request_limit():
+    result = estimate(spec(LANDSAT, dimensions=4000, **LANDSAT_PARAMS))
+    assert result["frames"] == 21
+    assert max(result["width"], result["height"]) == 4000
+    assert not result["exceeds_limits"]
+    assert result["suggestions"] == []
+
+
+def test_oversized_requests_suggest_smaller_dimensions(monkeypatch):
+    # Without tiling every frame is one thumbnail request.
+    monkeypatch.setattr(estimates, "MAX_TILE_SIDE", 100000)
+    result = estimate(spec(LANDSAT, dimensions=6000, **LANDSAT_PARAMS))
+    assert result["exceeds_limits"]
+    (suggestion,) = result["suggestions"]
+    assert list(suggestion) == ["dimensions"]
+    dimensions = suggestion["dimensions"]
+    smaller = estimate(spec(LANDSAT, dimensions=dimensions, **LANDSAT_PARAMS))
+    assert smaller["width"] * smaller["height"] * 3 <= MAX_REQUEST_BYTES
+    assert not smaller["exceeds_limits"]
+
+
+def test_total_size_is_capped_for_every_collection():
+    params = dict(start_date="2010-01-01", end_date="2020-12-31", frequency="day")
+    result = estimate(spec(MODIS_LST, dimensions=6000, **params))
+    assert result["frames"] == 4018
+    assert result["exceeds_limits"]
+    dimensions, frames = (next(iter(s.values())) for s in result["suggestions"])
+    smaller = estimate(spec(MODIS_LST, dimensions=dimensions, **params))
+    assert smaller["bytes"] <= MAX_TOTAL_BYTES
+    assert smaller["seconds"] <= MAX_SECONDS
+    assert frames * result["pixels_per_frame"] * 3 <= MAX_TOTAL_BYTES
+
+
+def test_long_tiled_renders_are_capped_by_time(monkeypatch):
+    monkeypatch.setattr(estimates, "MAX_SECONDS", 30)
+    result = estimate(spec(LANDSAT, dimensions=4000, **LANDSAT_PARAMS))
+    assert result["bytes"] <= MAX_TOTAL_BYTES
+    assert result["exceeds_limits"]
+    dimensions, frames = (next(iter(s.values())) for s in result["suggestions"])
+    smaller = estimate(spec(LANDSAT, dimensions=dimensions, **LANDSAT_PARAMS))
+    assert smaller["seconds"] <= 30
+    assert frames < result["frames"]
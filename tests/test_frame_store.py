@@ -0,0 +1,36 @@
+import numpy as np
+
+from utils.frame_store import FrameWriter, open_frames, store_paths
+
+
+def _write(gif, count, shape, max_bytes):
+    writer = FrameWriter(gif, count, max_bytes=max_bytes)
+    for i in range(count):
+        writer.write(np.full(shape, i, dtype=np.uint8), label=str(i))
+    return writer.close()
+
+
+def test_store_within_budget_keeps_full_frames(tmp_path):
+    gif = str(tmp_path / "t.gif")
+    assert _write(gif, 4, (100, 120, 3), max_bytes=1 << 20) == store_paths(gif)[0]
+    frames, labels = open_frames(gif)
+    assert frames.shape == (4, 100, 120, 3)
+    assert labels == ["0", "1", "2", "3"]
+    assert frames[2].max() == 2
+
+
+def test_oversized_store_is_downscaled_to_the_budget(tmp_path):
+    gif = str(tmp_path / "t.gif")
+    budget = 4 * 200 * 300 * 3 // 4
+    _write(gif, 4, (200, 300, 3), max_bytes=budget)
+    frames, labels = open_frames(gif)
+    assert frames.shape == (4, 100, 150, 3)
+    assert frames.nbytes <= budget
+    assert frames[3].min() == 3
+
+
+def test_store_too_small_to_scrub_is_skipped(tmp_path):
+    gif = str(tmp_path / "t.gif")
+    assert _write(gif, 4, (200, 300, 3), max_bytes=4 * 10 * 15 * 3) is None
+    assert open_frames(gif) is None
+    assert list(tmp_path.iterdir()) == []
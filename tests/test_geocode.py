@@ -0,0 +1,37 @@
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip("geemap")
+
+from utils import geocode  # noqa: E402
+from utils.geocode import GeocodeCache, Place  # noqa: E402
+
+Result = namedtuple("Result", ["address", "lat", "lng"])
+
+
+class Answers(list):
+    """Queued answers of the fake ``geemap.geocode`` and the keywords it got."""
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    answers, calls = Answers(), []
+
+    def fake_geocode(keyword):
+        calls.append(keyword)
+        return answers.pop(0)
+
+    monkeypatch.setattr(geocode.geemap, "geocode", fake_geocode)
+    answers.calls = calls
+    return answers
+
+
+def test_empty_results_are_not_cached(tmp_path, answers):
+    cache = GeocodeCache(str(tmp_path / "geocode.db"))
+    answers.extend([None, [Result("Mumbai, Maharashtra, IND", 19.07, 72.87)]])
+    assert cache.geocode("Mumbai") == []
+    assert cache.lookup("Mumbai") is None
+    assert cache.geocode("Mumbai") == [Place("Mumbai, Maharashtra, IND", 19.07, 72.87)]
+    assert cache.geocode("mumbai") == cache.lookup("Mumbai")
+    assert answers.calls == ["Mumbai", "Mumbai"]
@@ -0,0 +1,59 @@
+import sqlite3
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from utils.jobs import FAILED, JobQueue
+
+SPEC = {"collection": "Landsat", "roi": None, "reduce_gif": False, "params": {}}
+
+
+class BrokenExecutor:
+    def submit(self, *args):
+        raise BrokenProcessPool("A child process terminated abruptly.")
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class CrashingExecutor(BrokenExecutor):
+    """Accepts jobs whose worker then dies."""
+
+    def submit(self, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated."))
+        return future
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_workers=1)
+    queue._executor.shutdown()
+    return queue
+
+
+def test_dead_worker_fails_the_job(queue):
+    queue._executor = CrashingExecutor()
+    job = queue.get(queue.submit(SPEC))
+    assert job["status"] == FAILED
+    assert "BrokenProcessPool" in job["error"]
+    # The same spec is not deduplicated onto the failed job.
+    assert queue.submit(SPEC) != job["id"]
+
+
+def test_broken_pool_is_replaced(queue, monkeypatch):
+    queue._executor = BrokenExecutor()
+    monkeypatch.setattr(queue, "_new_executor", CrashingExecutor)
+    job = queue.get(queue.submit(SPEC))
+    assert isinstance(queue._executor, CrashingExecutor)
+    assert job["status"] == FAILED
+
+
+def test_rejected_job_leaves_no_row(queue, monkeypatch):
+    queue._executor = BrokenExecutor()
+    monkeypatch.setattr(queue, "_new_executor", BrokenExecutor)
+    with pytest.raises(BrokenProcessPool):
+        queue.submit(SPEC)
+    with sqlite3.connect(queue.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] == 0
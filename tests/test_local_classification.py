@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ee")
+pytest.importorskip("sklearn")
+
+from utils import local_classification  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def split():
+    # Three classes whose bands are far apart, so every learner separates them.
+    rng = np.random.default_rng(0)
+    labels = rng.integers(1, 4, size=(20, 20))
+    bands = labels[..., None] * 2000 + rng.integers(0, 200, size=(20, 20, 6))
+    pixels = np.concatenate([bands, labels[..., None]], axis=-1).astype(np.uint16)
+    return local_classification.sample_split(pixels, num_pixels=300, seed=0)
+
+
+@pytest.mark.parametrize("classifier", list(local_classification.LEARNERS))
+def test_learner_fits_synthetic_split(classifier, split):
+    evaluation = local_classification.evaluate(classifier, split)
+    assert evaluation.classifier == classifier
+    assert np.asarray(evaluation.matrix).sum() == len(split[3])
+    assert evaluation.accuracy > 0.9
+
+
+def test_confusion_matrix_counts_by_class_value():
+    actual = np.array([1, 1, 2, 3, 3])
+    predicted = np.array([1, 2, 2, 1, 3])
+    matrix = local_classification.confusion_matrix(actual, predicted)
+    assert matrix.shape == (4, 4)
+    assert matrix.sum() == 5
+    assert matrix[1, 1] == matrix[1, 2] == matrix[2, 2] == 1
+    assert matrix[3, 1] == matrix[3, 3] == 1
+
+
+def test_large_boxes_are_not_classified_locally():
+    box = local_classification.LOCAL_MAX_BOX * 2
+    key = (18.23, 73.26, box, "Decision Tree", ("SR_B2",), 100, 0, "local")
+    with pytest.raises(ValueError):
+        local_classification.classify(key, {"min": 1, "palette": []})
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ee")
+pytest.importorskip("geemap")
+pytest.importorskip("geopandas")
+
+from utils.collections import GOES, LANDSAT, MODIS_NDVI  # noqa: E402
+from utils.frame_cache import FrameCache  # noqa: E402
+from utils.pipeline import (  # noqa: E402
+    NDVI_PERIOD_DAYS,
+    PERIOD_DAYS,
+    SETTLE_DAYS,
+    frame_key,
+    is_settled,
+    pixel_key,
+    plan_incremental,
+)
+
+DAY = 86400
+# 2020-09-13 in milliseconds, as in ``system:time_start``.
+START = 1_600_000_000_000
+ROI = {
+    "type": "Polygon",
+    "coordinates": [[[72.77, 18.9], [72.99, 18.9], [72.99, 19.27], [72.77, 18.9]]],
+}
+
+
+def spec(collection=LANDSAT, **params):
+    params.setdefault("frequency", "year")
+    return {"collection": collection, "roi": ROI, "reduce_gif": False, "params": params}
+
+
+def test_period_settles_after_its_length_and_settle_days():
+    settled_at = START / 1000 + (PERIOD_DAYS["year"] + SETTLE_DAYS) * DAY
+    assert not is_settled(spec(), START, settled_at - 1)
+    assert is_settled(spec(), START, settled_at)
+    monthly = spec(frequency="month")
+    assert is_settled(monthly, START, START / 1000 + (31 + SETTLE_DAYS) * DAY)
+
+
+def test_ndvi_settles_after_its_composite_period():
+    settled_at = START / 1000 + (NDVI_PERIOD_DAYS + SETTLE_DAYS) * DAY
+    assert not is_settled(spec(MODIS_NDVI), START, settled_at - 1)
+    assert is_settled(spec(MODIS_NDVI), START, settled_at)
+
+
+def test_goes_scans_and_unknown_periods_are_settled():
+    assert is_settled(spec(GOES), START, START / 1000)
+    assert is_settled(spec(), None, 0)
+
+
+def test_styling_keeps_the_pixel_key():
+    assert pixel_key(spec(font_size=20)) == pixel_key(spec(font_size=40, fading=1))
+    assert pixel_key(spec(bands=["Red"])) != pixel_key(spec(bands=["NIR"]))
+
+
+def test_plan_incremental_fetches_only_stale_or_missing_frames(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    base = pixel_key(spec())
+    now = START / 1000 + 2000 * DAY
+    starts = [START + i * 365 * DAY * 1000 for i in range(4)]
+    sequence = {
+        "labels": ["2020", "2021", "2022", "2023"],
+        "time_start": starts,
+        "created": now,
+    }
+    cache.put_manifest(
+        base,
+        {
+            # Settled and cached.
+            "2020": {"time_start": starts[0], "fetched": now},
+            # Fetched while the year was still open.
+            "2021": {"time_start": starts[1], "fetched": starts[1] / 1000 + DAY},
+            # Settled, but its frame was pruned since.
+            "2022": {"time_start": starts[2], "fetched": now},
+        },
+    )
+    for label in ("2020", "2021"):
+        cache.put(frame_key(base, label), np.zeros((2, 2, 3), dtype=np.uint8))
+
+    assert plan_incremental(spec(), sequence, cache) == [1, 2, 3]
+    # A restyled render plans against the same frames.
+    assert plan_incremental(spec(font_size=40), sequence, cache) == [1, 2, 3]
@@ -0,0 +1,71 @@
+import os
+
+from utils.frame_store import fire_path, hls_dir, store_paths
+from utils.render_cache import RenderCache, geometry_fingerprint, spec_key
+
+POLYGON = {
+    "type": "Polygon",
+    "coordinates": [[[72.77, 18.9], [72.99, 18.9], [72.99, 19.27], [72.77, 18.9]]],
+}
+
+
+def feature(geometry, **properties):
+    return {"type": "Feature", "geometry": geometry, "properties": properties}
+
+
+def spec(roi=POLYGON, **params):
+    return {"collection": "Landsat", "roi": roi, "reduce_gif": False, "params": params}
+
+
+def test_fingerprint_ignores_wrappers_and_properties():
+    collection = {"type": "FeatureCollection", "features": [feature(POLYGON, id=1)]}
+    assert geometry_fingerprint(POLYGON) == geometry_fingerprint(collection)
+    assert geometry_fingerprint(feature(POLYGON, name="a")) == geometry_fingerprint(
+        feature(POLYGON, name="b")
+    )
+
+
+def test_fingerprint_rounds_coordinates():
+    nudged = {
+        "type": "Polygon",
+        "coordinates": [[[x + 1e-9, y] for x, y in POLYGON["coordinates"][0]]],
+    }
+    moved = {
+        "type": "Polygon",
+        "coordinates": [[[x + 1e-3, y] for x, y in POLYGON["coordinates"][0]]],
+    }
+    assert geometry_fingerprint(nudged) == geometry_fingerprint(POLYGON)
+    assert geometry_fingerprint(moved) != geometry_fingerprint(POLYGON)
+
+
+def test_spec_key_is_stable_across_param_order():
+    first = spec(start_year=2000, end_year=2020, bands=["Red", "Green", "Blue"])
+    second = spec(bands=["Red", "Green", "Blue"], end_year=2020, start_year=2000)
+    assert spec_key(first) == spec_key(second)
+    assert spec_key(first) == spec_key(spec(feature(POLYGON), **first["params"]))
+
+
+def test_spec_key_changes_with_params():
+    assert spec_key(spec(end_year=2020)) != spec_key(spec(end_year=2021))
+    assert spec_key(spec(end_year=2020)) != spec_key(spec(roi=None, end_year=2020))
+
+
+def test_put_moves_the_render_into_the_cache(tmp_path):
+    render = tmp_path / "render"
+    render.mkdir()
+    gif = str(render / "timelapse.gif")
+    frames, labels = store_paths(gif)
+    for path in (gif, gif.replace(".gif", ".mp4"), frames, labels, fire_path(gif)):
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+    os.makedirs(os.path.join(hls_dir(gif), "v0"))
+    with open(os.path.join(hls_dir(gif), "v0", "index.m3u8"), "w") as f:
+        f.write("#EXTM3U\n")
+
+    cache = RenderCache(str(tmp_path / "cache"))
+    cached_gif, cached_mp4 = cache.put("key", gif, gif.replace(".gif", ".mp4"))
+    assert os.listdir(render) == []
+    assert cache.get("key") == (cached_gif, cached_mp4)
+    assert os.path.exists(fire_path(cached_gif))
+    assert os.path.exists(os.path.join(hls_dir(cached_gif), "v0", "index.m3u8"))
+    assert cache.stats()["bytes"] == 5 * 10 + len("#EXTM3U\n")
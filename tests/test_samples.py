@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ee")
+pytest.importorskip("pyarrow")
+gpd = pytest.importorskip("geopandas")
+
+from utils import samples  # noqa: E402
+from utils.classification import BANDS, LABEL  # noqa: E402
+
+BOUNDS = [73.2, 18.2, 73.3, 18.3]
+
+
+class Calls(list):
+    share = 1.0
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Replace Earth Engine sampling with random points; record each request.
+
+    Setting ``calls.share`` returns only that share of the pixels asked for,
+    as Earth Engine does when pixels are masked.
+    """
+    calls = Calls()
+
+    def fetch_sample(bounds, bands, num_pixels, seed):
+        calls.append((num_pixels, seed))
+        rng = np.random.default_rng(seed)
+        num_pixels = int(num_pixels * calls.share)
+        lons = rng.uniform(bounds[0], bounds[2], num_pixels)
+        lats = rng.uniform(bounds[1], bounds[3], num_pixels)
+        data = {band: rng.integers(0, 10000, num_pixels) for band in bands}
+        data[LABEL] = rng.integers(1, 10, num_pixels)
+        return gpd.GeoDataFrame(
+            data, geometry=gpd.points_from_xy(lons, lats), crs="EPSG:4326"
+        )
+
+    monkeypatch.setattr(samples, "fetch_sample", fetch_sample)
+    return calls
+
+
+def test_top_up_samples_only_the_difference(tmp_path, fetched):
+    store = samples.SampleStore(str(tmp_path))
+    first = store.get(BOUNDS, BANDS, 100)
+    more = store.get(BOUNDS, BANDS, 250)
+    assert fetched == [(100, 0), (150, 1)]
+    assert len(first) == 100 and len(more) == 250
+    assert sorted(set(more[samples.BATCH])) == [0, 1]
+    # Stored rows and their split never change.
+    np.testing.assert_array_equal(
+        more[samples.RANDOM].to_numpy()[:100], first[samples.RANDOM].to_numpy()
+    )
+    assert list(more.geometry.to_wkb()[:100]) == list(first.geometry.to_wkb())
+
+
+def test_smaller_requests_read_the_stored_prefix(tmp_path, fetched):
+    store = samples.SampleStore(str(tmp_path))
+    stored = store.get(BOUNDS, BANDS, 200)
+    fetched.clear()
+    rows = store.get(BOUNDS, BANDS, 50)
+    assert fetched == []
+    np.testing.assert_array_equal(
+        rows[samples.RANDOM].to_numpy(), stored[samples.RANDOM].to_numpy()[:50]
+    )
+
+
+def test_each_seed_has_its_own_sample(tmp_path, fetched):
+    store = samples.SampleStore(str(tmp_path))
+    store.get(BOUNDS, BANDS, 100, seed=0)
+    store.get(BOUNDS, BANDS, 100, seed=7)
+    assert fetched == [(100, 0), (100, 7)]
+    assert store.read(BOUNDS, BANDS, seed=3) is None
+
+
+def test_shortfall_is_accepted(tmp_path, fetched):
+    fetched.share = 0.9
+    store = samples.SampleStore(str(tmp_path))
+    assert len(store.get(BOUNDS, BANDS, 1000)) == 900
+    assert len(store.get(BOUNDS, BANDS, 1000)) == 900
+    assert len(store.get(BOUNDS, BANDS, 500)) == 500
+    assert fetched == [(1000, 0)]
+    # A larger request samples the difference once, in a new batch.
+    assert len(store.get(BOUNDS, BANDS, 1100)) == 1080
+    store.get(BOUNDS, BANDS, 1100)
+    assert fetched == [(1000, 0), (200, 1)]
+    assert len(samples.SampleStore(str(tmp_path)).get(BOUNDS, BANDS, 1100)) == 1080
+    assert fetched == [(1000, 0), (200, 1)]
+
+
+def test_empty_sample_is_not_requested_again(tmp_path, fetched):
+    fetched.share = 0
+    store = samples.SampleStore(str(tmp_path))
+    assert len(store.get(BOUNDS, BANDS, 100)) == 0
+    assert len(store.get(BOUNDS, BANDS, 100)) == 0
+    assert fetched == [(100, 0)]
+    fetched.share = 1.0
+    assert len(store.get(BOUNDS, BANDS, 150)) == 150
+    assert fetched == [(100, 0), (150, 1)]
@@ -0,0 +1,100 @@
+import http.client
+from urllib.parse import urlsplit
+
+import pytest
+
+from utils.static_server import StaticServer
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = StaticServer(port=0)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def url(server, tmp_path):
+    path = tmp_path / "timelapse.mp4"
+    path.write_bytes(CONTENT)
+    return server.url(str(path))
+
+
+def request(url, method="GET", **headers):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    conn.request(method, parts.path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_full_response_is_cacheable(url):
+    response, body = request(url)
+    assert response.status == 200
+    assert body == CONTENT
+    assert response.getheader("Content-Type") == "video/mp4"
+    assert response.getheader("Accept-Ranges") == "bytes"
+    assert "immutable" in response.getheader("Cache-Control")
+
+
+def test_matching_etag_is_not_modified(url):
+    etag = request(url)[0].getheader("ETag")
+    response, body = request(url, **{"If-None-Match": etag})
+    assert response.status == 304
+    assert body == b""
+
+
+@pytest.mark.parametrize(
+    "requested,start,end",
+    [("bytes=10-19", 10, 19), ("bytes=1000-", 1000, 1023), ("bytes=-4", 1020, 1023)],
+)
+def test_byte_ranges(url, requested, start, end):
+    response, body = request(url, Range=requested)
+    assert response.status == 206
+    assert body == CONTENT[start : end + 1]
+    assert response.getheader("Content-Range") == f"bytes {start}-{end}/1024"
+
+
+def test_range_past_the_end_clamps(url):
+    response, body = request(url, Range="bytes=1020-5000")
+    assert response.status == 206
+    assert body == CONTENT[1020:]
+
+
+@pytest.mark.parametrize("requested", ["bytes=2048-", "bytes=-", "lines=1-2"])
+def test_unsatisfiable_ranges(url, requested):
+    response, _ = request(url, Range=requested)
+    assert response.status == 416
+    assert response.getheader("Content-Range") == "bytes */1024"
+
+
+def test_url_changes_with_content(server, tmp_path):
+    path = tmp_path / "timelapse.gif"
+    path.write_bytes(b"first")
+    first = server.url(str(path))
+    path.write_bytes(b"second!")
+    assert server.url(str(path)) != first
+    assert request(server.url(str(path)))[1] == b"second!"
+
+
+def test_directory_entries_stay_inside(server, tmp_path):
+    hls = tmp_path / "hls"
+    (hls / "v0").mkdir(parents=True)
+    (hls / "master.m3u8").write_text("#EXTM3U\n")
+    (hls / "v0" / "index.m3u8").write_text("#EXTM3U\n")
+    (tmp_path / "secret.txt").write_text("secret")
+    master = server.url(str(hls), "master.m3u8")
+    assert request(master)[0].status == 200
+    assert request(master.replace("master.m3u8", "v0/index.m3u8"))[0].status == 200
+    digest = urlsplit(master).path.split("/")[2]
+    assert server.lookup(digest, "../secret.txt") is None
+    assert request(master.replace("master.m3u8", "missing.ts"))[0].status == 404
+
+
+def test_unknown_digest_is_not_found(server):
+    response, _ = request(f"{server.base_url}/files/{'0' * 32}/timelapse.gif")
+    assert response.status == 404
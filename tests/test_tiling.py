@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from utils.tiling import frame_size, mosaic, plan_tiles
+
+BOUNDS = (72.0, 18.0, 74.5, 19.5)
+
+
+@pytest.mark.parametrize(
+    "dimensions,max_side", [(768, 2048), (5000, 2048), (1000, 300)]
+)
+def test_tiles_cover_the_frame_exactly(dimensions, max_side):
+    width, height, tiles = plan_tiles(BOUNDS, dimensions, max_side)
+    assert (width, height) == frame_size(BOUNDS, dimensions)
+    covered = np.zeros((height, width), dtype=int)
+    for tile in tiles:
+        assert tile.width <= max_side and tile.height <= max_side
+        covered[tile.y : tile.y + tile.height, tile.x : tile.x + tile.width] += 1
+    assert (covered == 1).all()
+
+
+def test_neighbouring_tiles_share_edges():
+    _, _, tiles = plan_tiles(BOUNDS, 1000, 300)
+    by_origin = {(tile.x, tile.y): tile for tile in tiles}
+    for tile in tiles:
+        right = by_origin.get((tile.x + tile.width, tile.y))
+        if right is not None:
+            assert right.bounds[0] == pytest.approx(tile.bounds[2])
+        below = by_origin.get((tile.x, tile.y + tile.height))
+        if below is not None:
+            assert below.bounds[3] == pytest.approx(tile.bounds[1])
+
+
+def test_mosaic_reassembles_tiles():
+    width, height, tiles = plan_tiles(BOUNDS, 1000, 300)
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    arrays = []
+    for tile in tiles:
+        block = frame[tile.y : tile.y + tile.height, tile.x : tile.x + tile.width]
+        # Thumbnails may come back a pixel larger and with an alpha channel.
+        padded = np.zeros((tile.height + 1, tile.width + 1, 4), dtype=np.uint8)
+        padded[: tile.height, : tile.width, :3] = block
+        arrays.append(padded)
+    np.testing.assert_array_equal(mosaic(tiles, arrays, width, height), frame)
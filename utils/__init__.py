@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+# Shared on-disk location for caches used by the pages and background workers.
+CACHE_DIR = os.environ.get(
+    "LULC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lulc_cache")
+)
+
+
+def cache_path(*parts):
+    """Return a path under CACHE_DIR, creating its parent directory."""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
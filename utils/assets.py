@@ -0,0 +1,102 @@
+import datetime
+import json
+import os
+import sqlite3
+import time
+
+import ee
+
+from utils import cache_path
+
+# Seconds asset metadata stays valid (1 day), override with TIMELAPSE_ASSET_TTL.
+DEFAULT_TTL = int(os.environ.get("TIMELAPSE_ASSET_TTL", 24 * 3600))
+
+
+def _date(millis):
+    if millis is None:
+        return None
+    date = datetime.datetime.fromtimestamp(millis / 1000, datetime.timezone.utc)
+    return date.strftime("%Y-%m-%d")
+
+
+def fetch_metadata(asset_id, kind="image_collection"):
+    """Fetch the metadata of an image or image collection in one round trip.
+
+    Returns a dict with ``bands``, their data ``types``, the nominal ``scale``
+    in metres and ``crs`` of the first band, the ``start`` and ``end`` dates
+    and the image ``count``.
+    """
+    if kind == "image":
+        image = ee.Image(asset_id)
+        start = end = image.get("system:time_start")
+        count = 1
+    else:
+        col = ee.ImageCollection(asset_id)
+        image = col.first()
+        start = col.aggregate_min("system:time_start")
+        end = col.aggregate_max("system:time_start")
+        count = col.size()
+    projection = image.select(0).projection()
+    info = ee.Dictionary(
+        {
+            "bands": image.bandNames(),
+            "types": image.bandTypes(),
+            "scale": projection.nominalScale(),
+            "crs": projection.crs(),
+            "start": start,
+            "end": end,
+            "count": count,
+        }
+    ).getInfo()
+    info["types"] = {
+        band: band_type.get("precision") for band, band_type in info["types"].items()
+    }
+    info["start"], info["end"] = _date(info.get("start")), _date(info.get("end"))
+    return info
+
+
+class AssetMetadata:
+    """Disk-backed cache of asset metadata shared by all pages and processes.
+
+    ``get`` answers from SQLite while an entry is younger than ``ttl`` seconds
+    and otherwise refetches it with ``fetch_metadata``. Invalid asset ids raise
+    ``ee.EEException`` and are not cached.
+    """
+
+    def __init__(self, db_path=None, ttl=DEFAULT_TTL):
+        self.db_path = db_path or cache_path("assets.db")
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS assets "
+                "(id TEXT, kind TEXT, info TEXT, created REAL, PRIMARY KEY (id, kind))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, asset_id, kind="image_collection"):
+        """Return the metadata dict of ``asset_id``, fetching it if not cached."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT info FROM assets WHERE id = ? AND kind = ? AND created > ?",
+                (asset_id, kind, time.time() - self.ttl),
+            ).fetchone()
+        if row is not None:
+            return json.loads(row[0])
+        info = fetch_metadata(asset_id, kind)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO assets (id, kind, info, created) "
+                "VALUES (?, ?, ?, ?)",
+                (asset_id, kind, json.dumps(info), time.time()),
+            )
+        return info
+
+
+def describe(info):
+    """Return a one-line human readable summary of asset metadata."""
+    text = f"{info['count']} images, {info['start']} to {info['end']}"
+    if info.get("scale"):
+        text += f", {info['scale']:,.0f} m ({info['crs']})"
+    return text
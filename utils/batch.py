@@ -0,0 +1,325 @@
+"""Render the timelapses of a manifest without the Streamlit app.
+
+Usage::
+
+    python -m utils.batch manifest.json --out renders --workers 4 --ee-concurrency 16
+
+The manifest is a JSON list of jobs (or ``{"defaults": {...}, "jobs": [...]}``).
+Each job has a unique ``name``, a ``collection`` and an ``roi`` that is either
+a GeoJSON object or the path of a GeoJSON, KML or zipped shapefile relative to
+the manifest. Landsat, Sentinel-2 and MODIS NDVI jobs take the fields of the
+Timelapse form: ``bands``, ``years``, ``months``, ``dates``, ``frequency``,
+``fps``, ``dimensions``, ``title``, ``overlay`` and ``renditions`` (HLS). Any
+geemap keyword can be given or overridden in ``params``, which is required for
+other collections.
+
+Finished jobs are appended to ``<manifest>.state.jsonl``, so a rerun after a
+crash only renders what is left. Renders already in the render cache are
+copied without touching Earth Engine.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils.collections import LANDSAT, MODIS_NDVI, SENTINEL2
+from utils.frame_store import hls_dir
+from utils.jobs import DEFAULT_WORKERS
+from utils.render_cache import RenderCache, spec_key
+
+# Earth Engine requests in flight across all batch workers, override with
+# TIMELAPSE_EE_CONCURRENCY.
+DEFAULT_EE_CONCURRENCY = int(os.environ.get("TIMELAPSE_EE_CONCURRENCY", 16))
+
+
+def load_roi(roi, base_dir):
+    """Return a manifest ROI as GeoJSON, reading it from a file if needed."""
+    if not isinstance(roi, str):
+        return roi
+    from utils.roi import load_upload
+    from utils.timelapse import gdf_to_geojson
+
+    path = os.path.join(base_dir, roi)
+    with open(path, "rb") as f:
+        return gdf_to_geojson(load_upload(f.read(), os.path.basename(path)))
+
+
+def _overlay_params(entry):
+    overlay = entry.get("overlay")
+    if not isinstance(overlay, dict):
+        overlay = {"data": overlay}
+    return {
+        "overlay_data": overlay.get("data"),
+        "overlay_color": overlay.get("color", "black"),
+        "overlay_width": overlay.get("width", 1),
+        "overlay_opacity": overlay.get("opacity", 1),
+    }
+
+
+def entry_spec(entry, base_dir="."):
+    """Build the spec of a manifest job with the defaults of the Timelapse form."""
+    from utils.timelapse import build_spec
+
+    kind = entry["collection"]
+    fps = entry.get("fps", 5)
+    params = {}
+    if kind in (LANDSAT, SENTINEL2):
+        months = entry.get("months", [1, 12])
+        bands = entry.get("bands", "SWIR1/NIR/Red")
+        params = {
+            "start_year": entry["years"][0],
+            "end_year": entry["years"][1],
+            "start_date": f"{months[0]:02d}-01",
+            "end_date": f"{months[1]:02d}-30",
+            "bands": bands.split("/") if isinstance(bands, str) else bands,
+            "apply_fmask": entry.get("apply_fmask", True),
+            "frames_per_second": fps,
+            "dimensions": entry.get("dimensions", 768),
+            **_overlay_params(entry),
+            "frequency": entry.get("frequency", "year"),
+            "date_format": None,
+            "title": entry.get("title", ""),
+            "title_xy": ("2%", "90%"),
+            "add_text": True,
+            "text_xy": ("2%", "2%"),
+            "text_sequence": None,
+            "font_type": "arial.ttf",
+            "font_size": 30,
+            "font_color": "#ffffff",
+            "add_progress_bar": True,
+            "progress_bar_color": "#0000ff",
+            "progress_bar_height": 5,
+            "loop": 0,
+            "mp4": entry.get("mp4", True),
+            "fading": 0.0,
+            "renditions": entry.get("renditions", False),
+        }
+    elif kind == MODIS_NDVI:
+        params = {
+            "data": entry.get("satellite", "Terra"),
+            "band": entry.get("bands", "NDVI"),
+            "start_date": entry["dates"][0],
+            "end_date": entry["dates"][1],
+            "dimensions": entry.get("dimensions", 768),
+            "framesPerSecond": fps,
+            **_overlay_params(entry),
+            "mp4": entry.get("mp4", True),
+            "fading": 0.0,
+            "renditions": entry.get("renditions", False),
+        }
+    # Overrides may carry geemap's own ``collection`` keyword (an asset id).
+    params.update(entry.get("params", {}))
+    return build_spec(
+        kind,
+        load_roi(entry["roi"], base_dir),
+        reduce_gif=entry.get("reduce_gif", False),
+        **params,
+    )
+
+
+def load_manifest(path):
+    """Return the jobs of a manifest with its defaults applied."""
+    with open(path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    defaults = manifest.get("defaults", {})
+    jobs = [dict(defaults, **job) for job in manifest["jobs"]]
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError("Job names in the manifest must be unique.")
+    return jobs
+
+
+def load_state(path):
+    """Return ``{name: record}`` of the jobs finished by previous runs."""
+    state = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    state[record["name"]] = record
+    return state
+
+
+def _init_worker(semaphore):
+    from utils.frame_fetch import limit_requests
+    from utils.jobs import _init_worker as init_earth_engine
+
+    init_earth_engine()
+    limit_requests(semaphore)
+
+
+def _render(spec):
+    # Runs inside a pool process.
+    from utils.memory import MemoryMeter
+    from utils.timelapse import render_cached
+
+    stats = {}
+    meter = MemoryMeter()
+    start = time.perf_counter()
+    try:
+        with meter:
+            out_gif, out_mp4 = render_cached(spec, RenderCache(), stats=stats)
+        stats.update(meter.stats())
+    except Exception:
+        return None, None, stats, time.perf_counter() - start, traceback.format_exc()
+    return out_gif, out_mp4, stats, time.perf_counter() - start, None
+
+
+def _copy(out_gif, out_mp4, out_dir, name):
+    outputs = {}
+    for path in (out_gif, out_mp4):
+        if path is not None:
+            target = os.path.join(out_dir, name + os.path.splitext(path)[1])
+            shutil.copyfile(path, target)
+            outputs[os.path.splitext(path)[1][1:]] = target
+    if out_gif is not None and os.path.isdir(hls_dir(out_gif)):
+        target = os.path.join(out_dir, f"{name}_hls")
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(hls_dir(out_gif), target)
+        outputs["hls"] = os.path.join(target, "master.m3u8")
+    return outputs
+
+
+def run(
+    manifest_path,
+    out_dir,
+    workers=DEFAULT_WORKERS,
+    ee_concurrency=DEFAULT_EE_CONCURRENCY,
+    retry_failed=False,
+):
+    """Render every unfinished job of a manifest and return the run's records."""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    state_path = f"{manifest_path}.state.jsonl"
+    state = load_state(state_path)
+    os.makedirs(out_dir, exist_ok=True)
+    cache = RenderCache()
+
+    records = []
+    pending = {}
+    for entry in load_manifest(manifest_path):
+        spec = entry_spec(entry, base_dir)
+        key = spec_key(spec)
+        previous = state.get(entry["name"])
+        if previous is not None and previous["key"] == key:
+            if previous["status"] == "done":
+                records.append(dict(previous, status="skipped"))
+                continue
+            if not retry_failed:
+                records.append(previous)
+                continue
+        hit = cache.get(key)
+        if hit is not None:
+            record = {
+                "name": entry["name"],
+                "key": key,
+                "status": "done",
+                "cached": True,
+                "seconds": 0.0,
+                "outputs": _copy(*hit, out_dir, entry["name"]),
+            }
+            _append(state_path, record)
+            records.append(record)
+            continue
+        pending[entry["name"]] = (key, spec)
+
+    context = multiprocessing.get_context("spawn")
+    semaphore = context.BoundedSemaphore(max(1, ee_concurrency))
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(semaphore,),
+    ) as executor:
+        futures = {
+            executor.submit(_render, spec): name
+            for name, (key, spec) in pending.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            out_gif, out_mp4, stats, seconds, error = future.result()
+            record = {
+                "name": name,
+                "key": pending[name][0],
+                "status": "failed" if error or out_gif is None else "done",
+                "cached": False,
+                "seconds": round(seconds, 3),
+                "stats": stats,
+            }
+            if record["status"] == "done":
+                record["outputs"] = _copy(out_gif, out_mp4, out_dir, name)
+            else:
+                record["error"] = error or "No timelapse was produced."
+            _append(state_path, record)
+            records.append(record)
+            print(f"{record['status']:>7} {name} ({seconds:.1f} s)", flush=True)
+    return records
+
+
+def _append(path, record):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def report(records, cache_stats=None):
+    """Return a plain-text timing report of a batch run, with the render
+    cache's counters from ``RenderCache.stats()`` if given."""
+    lines = [f"{'job':<32} {'status':<8} {'cached':<6} {'seconds':>9}"]
+    for record in sorted(records, key=lambda r: r["name"]):
+        lines.append(
+            f"{record['name']:<32} {record['status']:<8} "
+            f"{str(record.get('cached', False)):<6} {record.get('seconds', 0):>9.1f}"
+        )
+    rendered = [r for r in records if r["status"] == "done" and not r.get("cached")]
+    total = sum(r["seconds"] for r in rendered)
+    failed = sum(r["status"] == "failed" for r in records)
+    lines.append(
+        f"{len(records)} jobs, {len(rendered)} rendered in {total:.1f} s "
+        f"of worker time, {failed} failed"
+    )
+    if cache_stats is not None:
+        lines.append(
+            f"render cache: {cache_stats['hits']} hits, {cache_stats['misses']} "
+            f"misses, {cache_stats['evictions']} evictions, "
+            f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1e6:.1f} MB"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSON manifest of timelapse jobs")
+    parser.add_argument("--out", default="renders", help="output directory")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--ee-concurrency",
+        type=int,
+        default=DEFAULT_EE_CONCURRENCY,
+        help="Earth Engine requests in flight across all workers",
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true", help="rerun jobs that failed before"
+    )
+    parser.add_argument("--report", help="also write the run's records as JSON")
+    args = parser.parse_args(argv)
+
+    records = run(
+        args.manifest, args.out, args.workers, args.ee_concurrency, args.retry_failed
+    )
+    print(report(records, RenderCache().stats()))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(records, f, indent=2)
+    return 1 if any(r["status"] == "failed" for r in records) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+
+from utils import cache_path
+
+CATALOG_URL = (
+    "https://raw.githubusercontent.com/samapriya/Earth-Engine-Datasets-List"
+    "/master/gee_catalog.json"
+)
+
+# Seconds before the local catalog is refreshed (7 days), override with
+# TIMELAPSE_CATALOG_MAX_AGE.
+DEFAULT_MAX_AGE = int(os.environ.get("TIMELAPSE_CATALOG_MAX_AGE", 7 * 24 * 3600))
+
+SNIPPETS = {
+    "image_collection": "ee.ImageCollection",
+    "image": "ee.Image",
+    "table": "ee.FeatureCollection",
+    "table_collection": "ee.FeatureCollection",
+}
+
+# bm25 column weights for id, title, tags, provider and description.
+WEIGHTS = (10.0, 8.0, 4.0, 2.0, 1.0)
+
+
+def _text(value):
+    return ", ".join(value) if isinstance(value, list) else str(value or "")
+
+
+def _record(item):
+    """Add the fields ``geemap.search_ee_data`` results carry to a catalog item."""
+    item = dict(item)
+    item["uid"] = item["id"].replace("/", "_")
+    snippet = SNIPPETS.get(item.get("type"), "ee.Image")
+    item["ee_id_snippet"] = f"{snippet}('{item['id']}')"
+    item.setdefault("dates", f"{item.get('start_date')} - {item.get('end_date')}")
+    return item
+
+
+class CatalogIndex:
+    """Local, ranked full-text index of the Earth Engine data catalog.
+
+    The community catalog is downloaded once into SQLite and searched with FTS5
+    ranked by bm25, or with LIKE where FTS5 is unavailable. The index refreshes
+    in the background when older than ``max_age`` and keeps serving the last
+    copy while offline. Filtering by asset type is an indexed query.
+    """
+
+    def __init__(self, db_path=None, max_age=DEFAULT_MAX_AGE, url=CATALOG_URL):
+        self.db_path = db_path or cache_path("catalog.db")
+        self.max_age = max_age
+        self.url = url
+        self._refreshing = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS datasets (id TEXT PRIMARY KEY, title TEXT, "
+                "type TEXT, tags TEXT, provider TEXT, description TEXT, record TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS datasets_type ON datasets (type)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL)"
+            )
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS datasets_fts USING fts5("
+                    "id, title, tags, provider, description, "
+                    "content='datasets', content_rowid='rowid')"
+                )
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def updated(self):
+        """Return when the catalog was last downloaded, or 0 if never."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE name = 'updated'"
+            ).fetchone()
+        return row["value"] if row else 0
+
+    def refresh(self):
+        """Download the catalog and rebuild the index in one transaction."""
+        if not self._refreshing.acquire(blocking=False):
+            return
+        try:
+            response = requests.get(self.url, timeout=60)
+            response.raise_for_status()
+            rows = [
+                (
+                    item["id"],
+                    item.get("title", ""),
+                    item.get("type", ""),
+                    _text(item.get("tags")),
+                    _text(item.get("provider")),
+                    _text(item.get("description")),
+                    json.dumps(_record(item)),
+                )
+                for item in response.json()
+                if item.get("id")
+            ]
+            with self._connect() as conn:
+                conn.execute("DELETE FROM datasets")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO datasets (id, title, type, tags, provider, "
+                    "description, record) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                if self.fts:
+                    conn.execute(
+                        "INSERT INTO datasets_fts (datasets_fts) VALUES ('rebuild')"
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('updated', ?)",
+                    (time.time(),),
+                )
+        finally:
+            self._refreshing.release()
+
+    def ensure_fresh(self):
+        """Build the index if it is empty, or refresh it in the background if stale."""
+        updated = self.updated()
+        if not updated:
+            self.refresh()
+        elif time.time() - updated > self.max_age:
+            threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except (requests.RequestException, ValueError):
+            pass  # keep serving the previous catalog while offline
+
+    def search(self, keyword, types=None, limit=100):
+        """Return catalog records matching all words of ``keyword``, best first.
+
+        ``types`` restricts results to asset types such as ``"image_collection"``.
+        Records have the same fields as ``geemap.search_ee_data`` results.
+        """
+        self.ensure_fresh()
+        words = re.findall(r"\w+", keyword.lower())
+        if not words:
+            return []
+        type_filter, type_args = "", []
+        if types:
+            type_filter = f" AND d.type IN ({', '.join('?' * len(types))})"
+            type_args = list(types)
+
+        if self.fts:
+            query = " ".join(f'"{word}"*' for word in words)
+            sql = (
+                "SELECT d.record FROM datasets_fts f "
+                "JOIN datasets d ON d.rowid = f.rowid "
+                f"WHERE datasets_fts MATCH ?{type_filter} "
+                f"ORDER BY bm25(datasets_fts, {', '.join(map(str, WEIGHTS))}) LIMIT ?"
+            )
+            args = [query, *type_args, limit]
+        else:
+            columns = "d.id || ' ' || d.title || ' ' || d.tags || ' ' || d.provider"
+            match = " AND ".join(f"lower({columns}) LIKE ?" for _ in words)
+            sql = f"SELECT d.record FROM datasets d WHERE {match}{type_filter} LIMIT ?"
+            args = [f"%{word}%" for word in words] + type_args + [limit]
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, args).fetchall()
+        return [json.loads(row["record"]) for row in rows]
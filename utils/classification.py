@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+import numpy as np
+
+# Classifications kept per process, override with LULC_CLASSIFICATION_CACHE_SIZE.
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LULC_CLASSIFICATION_CACHE_SIZE", 32))
+# Seconds a cached classification is reused (2 hours, below the lifetime of an
+# Earth Engine map id), override with LULC_CLASSIFICATION_TTL.
+DEFAULT_TTL = int(os.environ.get("LULC_CLASSIFICATION_TTL", 2 * 3600))
+
+LANDSAT_SR = "LANDSAT/LC08/C02/T1_L2"
+ESRI_LULC = "projects/sat-io/open-datasets/landcover/ESRI_Global-LULC_10m"
+BANDS = ("SR_B2", "SR_B3", "SR_B4", "SR_B5", "SR_B6", "SR_B7")
+LABEL = "b1"
+DATE_RANGE = ("2023-01-01", "2023-12-31")
+# Fraction of the sample used for training, the rest is kept for validation.
+TRAIN_FRACTION = 0.8
+
+# Earth Engine classifiers offered by the page, by display name.
+CLASSIFIERS = {
+    "Random Forest": lambda: ee.Classifier.smileRandomForest(50),
+    "KNN": lambda: ee.Classifier.smileKNN(100),
+    "Gradient Tree Boost": lambda: ee.Classifier.smileGradientTreeBoost(50),
+    "SVM": lambda: ee.Classifier.libsvm(),
+    "Decision Tree": lambda: ee.Classifier.smileCart(),
+}
+
+# Where training and inference run: server-side, or locally on downloaded
+# pixels with utils.local_classification.
+EARTH_ENGINE = "Earth Engine"
+LOCAL = "Local (scikit-learn)"
+
+Classification = namedtuple(
+    "Classification", ["classifier", "image", "tile_url", "created"]
+)
+# Validation of one classifier. ``seconds`` covers training and validation
+# together, since Earth Engine only trains once the validation is computed.
+# ``matrix[actual][predicted]`` counts pixels by class value, as in
+# ee.ConfusionMatrix.
+Evaluation = namedtuple(
+    "Evaluation", ["classifier", "seconds", "accuracy", "kappa", "matrix"]
+)
+
+
+def roi_bounds(center_lat, center_lon, box_size):
+    """Return ``[west, south, east, north]`` of a square box around a center."""
+    half_size = box_size / 2
+    return [
+        center_lon - half_size,
+        center_lat - half_size,
+        center_lon + half_size,
+        center_lat + half_size,
+    ]
+
+
+def classification_key(
+    center_lat,
+    center_lon,
+    box_size,
+    classifier,
+    bands=BANDS,
+    num_pixels=1000,
+    seed=0,
+    engine=EARTH_ENGINE,
+):
+    """Return the cache key of a classification request.
+
+    The center is rounded to the two decimals the page inputs show, so nudging
+    a number input back and forth maps to the same entry.
+    """
+    return (
+        round(center_lat, 2),
+        round(center_lon, 2),
+        round(box_size, 4),
+        classifier,
+        tuple(bands),
+        int(num_pixels),
+        int(seed),
+        engine,
+    )
+
+
+def landsat_image(roi, bands=BANDS):
+    """Return the least cloudy Landsat 8 surface reflectance scene over ``roi``."""
+    return (
+        ee.ImageCollection(LANDSAT_SR)
+        .filterBounds(roi)
+        .filterDate(*DATE_RANGE)
+        .sort("CLOUD_COVER")
+        .first()
+        .select(list(bands))
+    )
+
+
+def label_image(roi):
+    return ee.ImageCollection(ESRI_LULC).mosaic().clip(roi)
+
+
+def sample_split(bounds, bands=BANDS, num_pixels=1000, seed=0):
+    """Return the ``(training, validation)`` split of a labelled pixel sample.
+
+    The sample is read from the local sample store and only drawn on Earth
+    Engine the first time an ROI, or more pixels of it, are asked for.
+    """
+    from utils.samples import default_store, split
+
+    return split(default_store().get(bounds, bands, num_pixels, seed), bands)
+
+
+def train(classifier, training, bands=BANDS):
+    """Train the named Earth Engine classifier on a training sample."""
+    return CLASSIFIERS[classifier]().train(
+        features=training, classProperty=LABEL, inputProperties=list(bands)
+    )
+
+
+def classify(key, vis_params):
+    """Train and apply the classifier of ``key`` and fetch its tile URL.
+
+    Local classifications have no tile URL; their ``image`` is an RGBA array.
+    """
+    center_lat, center_lon, box_size, classifier, bands, num_pixels, seed = key[:7]
+    if key[7] == LOCAL:
+        from utils import local_classification
+
+        return local_classification.classify(key, vis_params)
+    bounds = roi_bounds(center_lat, center_lon, box_size)
+    image = landsat_image(ee.Geometry.Rectangle(bounds), bands)
+    training, _ = sample_split(bounds, bands, num_pixels, seed)
+    trained = train(classifier, training, bands)
+    classified = image.classify(trained)
+    map_id = ee.Image(classified).getMapId(vis_params)
+    return Classification(
+        trained, classified, map_id["tile_fetcher"].url_format, time.time()
+    )
+
+
+class ClassificationCache:
+    """In-process LRU cache of trained classifiers and their classified images.
+
+    Entries are keyed by ``classification_key`` plus the visualization, hold
+    the trained classifier, the classified image and its tile URL, and expire
+    after ``ttl`` seconds so the map never points at a stale map id. Reruns
+    that only pan the map or change an unrelated widget reuse the entry
+    without any Earth Engine request.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key, vis_params):
+        """Return the classification of ``key``, computing it on a miss."""
+        full_key = key + (repr(sorted(vis_params.items())),)
+        entry = self._lookup(full_key)
+        if entry is None:
+            entry = classify(key, vis_params)
+            self._store(full_key, entry)
+        return entry
+
+
+def scores(matrix):
+    """Return ``(overall accuracy, kappa)`` of a confusion matrix."""
+    matrix = np.asarray(matrix, dtype=float)
+    total = matrix.sum()
+    if not total:
+        return 0.0, 0.0
+    observed = np.trace(matrix) / total
+    expected = (matrix.sum(axis=0) * matrix.sum(axis=1)).sum() / total**2
+    kappa = (observed - expected) / (1 - expected) if expected < 1 else 1.0
+    return float(observed), float(kappa)
+
+
+def evaluate(classifier, training, validation, bands=BANDS):
+    """Train one classifier on Earth Engine and score it on the validation split.
+
+    Earth Engine trains the classifier lazily while it classifies the
+    validation sample, so both are timed as one request.
+    """
+    start = time.perf_counter()
+    trained = train(classifier, training, bands)
+    matrix = validation.classify(trained).errorMatrix(LABEL, "classification")
+    result = ee.Dictionary(
+        {
+            "matrix": matrix.array(),
+            "accuracy": matrix.accuracy(),
+            "kappa": matrix.kappa(),
+        }
+    ).getInfo()
+    return Evaluation(
+        classifier,
+        time.perf_counter() - start,
+        result["accuracy"],
+        result["kappa"],
+        result["matrix"],
+    )
+
+
+def compare(key, classifiers=tuple(CLASSIFIERS)):
+    """Train and validate ``classifiers`` concurrently on one sample.
+
+    ``key`` is a ``classification_key``; its classifier is ignored. All
+    classifiers share the training and validation split of the key's sample.
+    Returns one Evaluation per classifier, in the order given.
+    """
+    center_lat, center_lon, box_size, _, bands, num_pixels, seed = key[:7]
+    if key[7] == LOCAL:
+        from utils import local_classification
+
+        return local_classification.compare(key, classifiers)
+    training, validation = sample_split(
+        roi_bounds(center_lat, center_lon, box_size), bands, num_pixels, seed
+    )
+    with ThreadPoolExecutor(max_workers=len(classifiers)) as executor:
+        return list(
+            executor.map(
+                lambda name: evaluate(name, training, validation, bands), classifiers
+            )
+        )
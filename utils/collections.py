@@ -0,0 +1,14 @@
+# Display names of the timelapse collections, as offered by the Timelapse page.
+LANDSAT = "Landsat TM-ETM-OLI Surface Reflectance"
+SENTINEL2 = "Sentinel-2 MSI Surface Reflectance"
+GOES = "Geostationary Operational Environmental Satellites (GOES)"
+GOES_FIRE = "GOES Fire/Hotspot Characterization"
+MODIS_NDVI = "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km"
+MODIS_LST = "MODIS Gap filled Land Surface Temperature Daily"
+MODIS_OCEAN = "MODIS Ocean Color SMI"
+ANY_COLLECTION = "Any Earth Engine ImageCollection"
+NAIP = "USDA National Agriculture Imagery Program (NAIP)"
+
+# Collections whose frames are fetched one thumbnail request at a time and
+# encoded by the pipeline; the others are rendered by geemap in one request.
+FRAME_COLLECTIONS = (LANDSAT, SENTINEL2, MODIS_NDVI, GOES, GOES_FIRE)
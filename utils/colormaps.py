@@ -0,0 +1,85 @@
+import functools
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils import cache_path
+
+# Colors per palette offered in the palette pickers.
+N_CLASSES = 15
+
+# Colors stored per colormap in the sprite, one sprite row per colormap.
+SPRITE_WIDTH = 256
+
+# Height in pixels of a colormap preview strip.
+PREVIEW_HEIGHT = 24
+
+
+def _hex(rgb):
+    return "".join(f"{value:02x}" for value in rgb)
+
+
+def build(path=None):
+    """Render every geemap colormap once into a sprite PNG and a palette index.
+
+    Each sprite row holds ``SPRITE_WIDTH`` colors of one colormap; the JSON
+    index lists the colormap names in row order and their ``N_CLASSES`` palette.
+    This is the only place Matplotlib is used.
+    """
+    import geemap.colormaps as cm
+
+    path = path or cache_path("colormaps", "sprite.png")
+    names, rows, palettes = [], [], {}
+    for name in cm.list_colormaps():
+        try:
+            colors = cm.get_palette(name, SPRITE_WIDTH)
+            palettes[name] = cm.get_palette(name, N_CLASSES)
+        except (ValueError, KeyError):
+            continue
+        rows.append([[int(c[i : i + 2], 16) for i in (0, 2, 4)] for c in colors])
+        names.append(name)
+
+    sprite = np.array(rows, dtype=np.uint8)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    Image.fromarray(sprite).save(tmp, format="PNG", optimize=True)
+    os.replace(tmp, path)
+    index = os.path.splitext(path)[0] + ".json"
+    with open(f"{index}.{os.getpid()}.tmp", "w") as f:
+        json.dump({"names": names, "palettes": palettes}, f)
+    os.replace(f"{index}.{os.getpid()}.tmp", index)
+
+
+@functools.lru_cache(maxsize=None)
+def _load():
+    path = cache_path("colormaps", "sprite.png")
+    index = os.path.splitext(path)[0] + ".json"
+    if not (os.path.exists(path) and os.path.exists(index)):
+        build(path)
+    with open(index) as f:
+        meta = json.load(f)
+    sprite = np.asarray(Image.open(path).convert("RGB"))
+    rows = {name: i for i, name in enumerate(meta["names"])}
+    return sprite, rows, meta["names"], meta["palettes"]
+
+
+def list_colormaps():
+    """Return the names of all colormaps, in ``geemap.colormaps`` order."""
+    return list(_load()[2])
+
+
+def get_palette(name, n_class=N_CLASSES):
+    """Return ``n_class`` hex colors (without ``#``) sampled from a colormap."""
+    sprite, rows, _, palettes = _load()
+    if n_class == N_CLASSES:
+        return list(palettes[name])
+    row = sprite[rows[name]]
+    positions = np.linspace(0, SPRITE_WIDTH - 1, n_class).round().astype(int)
+    return [_hex(row[i]) for i in positions]
+
+
+def preview(name, height=PREVIEW_HEIGHT):
+    """Return a ``(height, SPRITE_WIDTH, 3)`` view of a colormap for ``st.image``."""
+    sprite, rows, _, _ = _load()
+    return np.broadcast_to(sprite[rows[name]], (height, SPRITE_WIDTH, 3))
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+
+# Earth Engine Cloud project of the app, override with LULC_EE_PROJECT.
+PROJECT = os.environ.get("LULC_EE_PROJECT", "lulc-429712")
+
+# Environment variable that may hold a refresh token, as read by
+# geemap.ee_initialize on hosted deployments.
+TOKEN_NAME = "EARTHENGINE_TOKEN"
+CREDENTIALS = os.path.expanduser("~/.config/earthengine/credentials")
+
+NOT_STARTED = "not started"
+INITIALIZING = "initializing"
+READY = "ready"
+FAILED = "failed"
+
+
+class Session:
+    """Initialize Earth Engine lazily, once per process, for every thread.
+
+    Pages call ``initialize`` on each rerun. The first call initializes with
+    the stored credentials (or ``token_name``) under a lock while concurrent
+    callers wait for it; later calls return immediately. A failed attempt is
+    recorded in ``health``, raised, and retried by the next call.
+    """
+
+    def __init__(self, project=PROJECT, token_name=TOKEN_NAME):
+        self.project = project
+        self.token_name = token_name
+        self.state = NOT_STARTED
+        self.error = None
+        self.seconds = None
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def _write_token(self):
+        token = os.environ.get(self.token_name)
+        if token and not os.path.exists(CREDENTIALS):
+            os.makedirs(os.path.dirname(CREDENTIALS), exist_ok=True)
+            with open(CREDENTIALS, "w") as f:
+                json.dump({"refresh_token": token}, f)
+
+    def _initialize(self):
+        import ee
+
+        self._write_token()
+        try:
+            ee.Initialize(project=self.project)
+        except ee.EEException as e:
+            # The interactive authentication flow cannot run on a server, so
+            # missing credentials fail the session instead.
+            raise RuntimeError(
+                f"Earth Engine credentials are missing or invalid; set "
+                f"{self.token_name} or run `earthengine authenticate`: {e}"
+            ) from e
+
+    def initialize(self):
+        """Initialize Earth Engine if this process has not yet, and return self."""
+        if self.state == READY:
+            return self
+        with self._lock:
+            if self.state == READY:
+                return self
+            self.state = INITIALIZING
+            self.attempts += 1
+            start = time.perf_counter()
+            try:
+                self._initialize()
+            except Exception as e:
+                self.state, self.error = FAILED, e
+                raise
+            finally:
+                self.seconds = time.perf_counter() - start
+            self.state, self.error = READY, None
+        return self
+
+    def health(self):
+        """Return the session state as a plain dict."""
+        return {
+            "state": self.state,
+            "project": self.project,
+            "pid": os.getpid(),
+            "attempts": self.attempts,
+            "init_seconds": self.seconds,
+            "error": None if self.error is None else repr(self.error),
+        }
+
+
+_session = Session()
+
+
+def ensure_initialized():
+    """Initialize Earth Engine once per process; cheap on every later call."""
+    return _session.initialize()
+
+
+def health():
+    return _session.health()
+
+
+def require_earth_engine():
+    """Initialize Earth Engine for a Streamlit page, or show why it failed and
+    stop the script run."""
+    import streamlit as st
+
+    try:
+        ensure_initialized()
+    except Exception:
+        st.error("Earth Engine could not be initialized.")
+        st.json(health())
+        st.stop()
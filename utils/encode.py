@@ -0,0 +1,199 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+# One palette per frame, and only the changed rectangle of each frame is stored.
+GIF_FILTER = (
+    "split[a][b];[a]palettegen=stats_mode=single[p];"
+    "[b][p]paletteuse=new=1:diff_mode=rectangle"
+)
+
+PAD_EVEN = "pad=ceil(iw/2)*2:ceil(ih/2)*2"
+X264 = ["-c:v", "libx264", "-pix_fmt", "yuv420p"]
+
+# Heights of the lower adaptive streaming renditions. Those below the frame
+# height are produced next to a full-resolution rendition.
+RENDITION_HEIGHTS = (720, 480, 360)
+# Target bitrate of a rendition in bits per pixel per frame.
+BITS_PER_PIXEL = 0.1
+HLS_SEGMENT_SECONDS = 4
+
+
+def _rawvideo_input(width, height, fps):
+    return [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-s",
+        f"{width}x{height}",
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+    ]
+
+
+def gif_command(out_gif, width, height, fps, loop=0):
+    return _rawvideo_input(width, height, fps) + [
+        "-filter_complex",
+        GIF_FILTER,
+        "-loop",
+        str(loop),
+        out_gif,
+    ]
+
+
+def rendition_ladder(width, height, fps):
+    """Return ``(width, height, bitrate)`` of each HLS rendition, largest first."""
+    sizes = [(width + width % 2, height + height % 2)]
+    for rendition in RENDITION_HEIGHTS:
+        if rendition < height:
+            scaled = round(width * rendition / height)
+            sizes.append((scaled + scaled % 2, rendition))
+    return [(w, h, max(int(w * h * fps * BITS_PER_PIXEL), 200_000)) for w, h in sizes]
+
+
+def mp4_command(out_mp4, width, height, fps, out_hls=None):
+    """Return the ffmpeg command writing the MP4 and, with ``out_hls``, an HLS
+    rendition ladder with a master playlist from the same input frames."""
+    command = _rawvideo_input(width, height, fps)
+    if out_hls is None:
+        return command + ["-vf", PAD_EVEN, *X264, "-movflags", "+faststart", out_mp4]
+
+    ladder = rendition_ladder(width, height, fps)
+    outputs = "".join(f"[s{i}]" for i in range(len(ladder)))
+    graph = [f"[0:v]{PAD_EVEN},split={len(ladder) + 1}[mp4]{outputs}"]
+    graph += [f"[s{i}]scale={w}:{h}[h{i}]" for i, (w, h, _) in enumerate(ladder)]
+    command += ["-filter_complex", ";".join(graph)]
+    command += ["-map", "[mp4]", *X264, "-movflags", "+faststart", out_mp4]
+
+    gop = str(max(1, int(fps * HLS_SEGMENT_SECONDS)))
+    for i, (_, _, bitrate) in enumerate(ladder):
+        command += ["-map", f"[h{i}]", f"-b:v:{i}", str(bitrate)]
+        command += [f"-maxrate:v:{i}", str(bitrate)]
+        command += [f"-bufsize:v:{i}", str(2 * bitrate)]
+    return command + [
+        *X264,
+        "-g",
+        gop,
+        "-keyint_min",
+        gop,
+        "-sc_threshold",
+        "0",
+        "-f",
+        "hls",
+        "-hls_time",
+        str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_filename",
+        os.path.join(out_hls, "v%v", "segment%03d.ts"),
+        "-master_pl_name",
+        "master.m3u8",
+        "-var_stream_map",
+        " ".join(f"v:{i}" for i in range(len(ladder))),
+        os.path.join(out_hls, "v%v", "index.m3u8"),
+    ]
+
+
+class StreamingEncoder:
+    """Encode frames to GIF and MP4 in a single pass over the frames.
+
+    Each frame is piped once into one ffmpeg process per output. The processes
+    run in parallel and only buffer a few frames, so peak memory does not grow
+    with the frame count. With ``out_hls`` the MP4 process also writes an HLS
+    rendition ladder into that directory. ``close`` returns the encode time of
+    each output; ``abort`` stops the processes and removes partial outputs.
+    ffmpeg is required (see packages.txt).
+    """
+
+    def __init__(
+        self, out_gif, width, height, fps, loop=0, out_mp4=None, out_hls=None
+    ):
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg is required to encode timelapses")
+        self.width, self.height = width, height
+        self.outputs = {"gif": out_gif}
+        self.out_hls = None
+        commands = {"gif": gif_command(out_gif, width, height, fps, loop)}
+        if out_mp4 is not None:
+            self.outputs["mp4"] = out_mp4
+            if out_hls is not None:
+                os.makedirs(out_hls, exist_ok=True)
+                self.out_hls = out_hls
+                self.outputs["hls"] = os.path.join(out_hls, "master.m3u8")
+            commands["mp4"] = mp4_command(out_mp4, width, height, fps, out_hls)
+
+        self._start = time.perf_counter()
+        self._processes = {}
+        try:
+            for name, command in commands.items():
+                stderr = tempfile.TemporaryFile()
+                process = subprocess.Popen(
+                    command, stdin=subprocess.PIPE, stderr=stderr
+                )
+                self._processes[name] = (process, stderr)
+        except BaseException:
+            self.abort()
+            raise
+
+    def write(self, frame):
+        """Append an ``(height, width, 3)`` uint8 frame to every output."""
+        data = frame.tobytes()
+        for process, _ in self._processes.values():
+            process.stdin.write(data)
+
+    def close(self):
+        """Finish all outputs and return ``{output: seconds}`` encode times."""
+        timings = {}
+
+        def wait(name, process):
+            process.wait()
+            timings[name] = time.perf_counter() - self._start
+
+        threads = []
+        for name, (process, _) in self._processes.items():
+            process.stdin.close()
+            thread = threading.Thread(target=wait, args=(name, process))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        failed = None
+        for name, (process, stderr) in self._processes.items():
+            stderr.seek(0)
+            message = stderr.read().decode(errors="replace").strip()
+            stderr.close()
+            if process.returncode != 0 and failed is None:
+                failed = f"ffmpeg failed to encode {name}: {message}"
+        self._processes = {}
+        if failed is not None:
+            self.abort()
+            raise RuntimeError(failed)
+        return timings
+
+    def abort(self):
+        """Kill any running ffmpeg process and delete what was written so far."""
+        for process, stderr in self._processes.values():
+            process.kill()
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            process.wait()
+            stderr.close()
+        self._processes = {}
+        for name, path in self.outputs.items():
+            if name != "hls" and os.path.exists(path):
+                os.remove(path)
+        if self.out_hls is not None:
+            shutil.rmtree(self.out_hls, ignore_errors=True)
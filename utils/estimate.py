@@ -0,0 +1,173 @@
+import datetime
+import math
+import os
+
+from utils.collections import (
+    FRAME_COLLECTIONS,
+    GOES,
+    GOES_FIRE,
+    LANDSAT,
+    MODIS_LST,
+    MODIS_NDVI,
+    MODIS_OCEAN,
+    NAIP,
+    SENTINEL2,
+)
+from utils.frame_fetch import DEFAULT_CONCURRENCY
+from utils.tiling import MAX_TILE_SIDE, frame_size, geojson_bounds, to_mercator
+
+# Native resolution of each collection in metres.
+NATIVE_RESOLUTION = {
+    LANDSAT: 30,
+    SENTINEL2: 10,
+    GOES: 2000,
+    GOES_FIRE: 2000,
+    MODIS_NDVI: 1000,
+    MODIS_LST: 1000,
+    MODIS_OCEAN: 4616,
+    NAIP: 1,
+}
+
+# Earth Engine refuses thumbnail and video requests above this many bytes.
+MAX_REQUEST_BYTES = 50331648
+
+# Largest timelapse worth requesting, in bytes delivered by Earth Engine (2 GB)
+# and estimated wall time (30 minutes). Override with TIMELAPSE_MAX_TOTAL_BYTES
+# and TIMELAPSE_MAX_SECONDS.
+MAX_TOTAL_BYTES = int(os.environ.get("TIMELAPSE_MAX_TOTAL_BYTES", 2 << 30))
+MAX_SECONDS = int(os.environ.get("TIMELAPSE_MAX_SECONDS", 1800))
+
+# Rough timings observed for thumbnail requests, used for the wall time guess.
+SECONDS_PER_REQUEST = 2.0
+SECONDS_PER_MEGAPIXEL = 1.0
+
+FREQUENCY_DAYS = {
+    "year": 365.25,
+    "quarter": 91.3,
+    "month": 30.4,
+    "week": 7,
+    "day": 1,
+    "hour": 1 / 24,
+    "minute": 1 / 1440,
+    "second": 1 / 86400,
+}
+
+GOES_SCAN_MINUTES = {"full_disk": 10, "conus": 5, "mesoscale": 1}
+
+
+def _days(start, end):
+    start = datetime.date.fromisoformat(str(start)[:10])
+    end = datetime.date.fromisoformat(str(end)[:10])
+    return max((end - start).days, 0) + 1
+
+
+def frame_count(collection, params):
+    """Return the expected number of frames for a collection and its parameters."""
+    if collection in (LANDSAT, SENTINEL2):
+        years = params["end_year"] - params["start_year"] + 1
+        months = int(params["end_date"][:2]) - int(params["start_date"][:2]) + 1
+        per_year = {"year": 1, "quarter": math.ceil(months / 3), "month": months}
+        return years * per_year.get(params["frequency"], 1)
+    if collection == MODIS_NDVI:
+        return math.ceil(_days(params["start_date"], params["end_date"]) / 16)
+    if collection in (GOES, GOES_FIRE):
+        start = datetime.datetime.fromisoformat(params["start_date"])
+        end = datetime.datetime.fromisoformat(params["end_date"])
+        minutes = max((end - start).total_seconds() / 60, 0)
+        return math.ceil(minutes / GOES_SCAN_MINUTES.get(params.get("scan"), 10))
+    if collection == NAIP:
+        return params["end_year"] - params["start_year"] + 1
+    days = _days(params["start_date"], params["end_date"])
+    return math.ceil(days / FREQUENCY_DAYS.get(params.get("frequency"), 365.25))
+
+
+def estimate(spec, concurrency=DEFAULT_CONCURRENCY):
+    """Predict the size and cost of rendering a timelapse spec.
+
+    Returns a dict with the frame count, frame size, pixels per frame, the bytes
+    Earth Engine has to deliver, an approximate wall time, whether the request
+    exceeds Earth Engine limits and suggested parameter changes. Returns None
+    when the spec has no ROI yet.
+    """
+    collection, params = spec["collection"], spec["params"]
+    if spec["roi"] is None:
+        return None
+    bounds = geojson_bounds(spec["roi"])
+    dimensions = params.get("dimensions", 768)
+    width, height = frame_size(bounds, dimensions)
+    frames = frame_count(collection, params)
+    pixels = width * height
+    frame_bytes = pixels * 3
+
+    xmin, ymin = to_mercator(bounds[0], bounds[1])
+    xmax, ymax = to_mercator(bounds[2], bounds[3])
+    native = NATIVE_RESOLUTION.get(collection)
+    native_side = (
+        int(max(xmax - xmin, ymax - ymin) / native) if native is not None else None
+    )
+
+    per_frame = collection in FRAME_COLLECTIONS
+    if per_frame:
+        tiles = math.ceil(width / MAX_TILE_SIDE) * math.ceil(height / MAX_TILE_SIDE)
+        requests = frames * tiles
+        seconds = (
+            requests * SECONDS_PER_REQUEST / concurrency
+            + frames * pixels / 1e6 * SECONDS_PER_MEGAPIXEL / concurrency
+        )
+        request_bytes = frame_bytes / tiles
+    else:
+        # geemap renders the whole animation in one video request, which is
+        # not held to the thumbnail byte limit.
+        seconds = SECONDS_PER_REQUEST + frames * pixels / 1e6 * SECONDS_PER_MEGAPIXEL
+        request_bytes = None
+
+    total_bytes = frames * frame_bytes
+    too_large = request_bytes is not None and request_bytes > MAX_REQUEST_BYTES
+    too_long = total_bytes > MAX_TOTAL_BYTES or seconds > MAX_SECONDS
+    result = {
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "pixels_per_frame": pixels,
+        "bytes": total_bytes,
+        "seconds": round(seconds, 1),
+        "native_side": native_side,
+        "exceeds_limits": too_large or too_long,
+        "suggestions": [],
+    }
+    if not result["exceeds_limits"]:
+        return result
+
+    # Bytes and pixel time grow with the square of the dimensions.
+    scale = math.sqrt(
+        min(
+            MAX_REQUEST_BYTES / request_bytes if too_large else 1.0,
+            MAX_TOTAL_BYTES / max(total_bytes, MAX_TOTAL_BYTES),
+            MAX_SECONDS / max(seconds, MAX_SECONDS),
+        )
+    )
+    if int(dimensions * scale) >= 256:
+        result["suggestions"].append({"dimensions": int(dimensions * scale)})
+    # The size of each tile request does not depend on the number of frames.
+    if too_long and not too_large:
+        max_frames = min(
+            MAX_TOTAL_BYTES // frame_bytes,
+            int(frames * MAX_SECONDS / max(seconds, MAX_SECONDS)),
+        )
+        if max_frames >= 2:
+            result["suggestions"].append({"frames": max_frames})
+    return result
+
+
+def describe(result):
+    """Return a one-line human readable summary of an estimate."""
+    megabytes = result["bytes"] / 1024**2
+    text = (
+        f"{result['frames']} frames of {result['width']}x{result['height']} px, "
+        f"~{megabytes:,.0f} MB from Earth Engine, ~{result['seconds']:,.0f} s"
+    )
+    if result["native_side"] is not None and result["native_side"] < max(
+        result["width"], result["height"]
+    ):
+        text += f" (native resolution only supports ~{result['native_side']} px)"
+    return text
@@ -0,0 +1,99 @@
+import json
+import os
+
+import numpy as np
+
+from utils import cache_path
+
+# Default size bound of the frame cache (5 GB), override with TIMELAPSE_FRAME_CACHE_MAX_BYTES.
+DEFAULT_MAX_BYTES = int(os.environ.get("TIMELAPSE_FRAME_CACHE_MAX_BYTES", 5 * 1024**3))
+
+
+class FrameCache:
+    """On-disk store of raw (unannotated) timelapse frames as ``.npy`` arrays.
+
+    Frames are addressed by a key derived from the ROI, collection, bands and
+    period, so restyling or re-encoding a timelapse never refetches imagery.
+    The frame label sequence of a request and a manifest of the periods already
+    materialized for each ROI/collection/bands combination are kept as JSON.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or os.path.dirname(cache_path("frames", ".keep"))
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(self.root, "labels"), exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def has(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Return the cached frame array for ``key``, or None."""
+        path = self._path(key)
+        try:
+            array = np.load(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        return array
+
+    def put(self, key, array):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp, path)
+
+    def _read_json(self, kind, key):
+        try:
+            with open(os.path.join(self.root, kind, f"{key}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_json(self, kind, key, obj):
+        path = os.path.join(self.root, kind, f"{key}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+
+    def get_labels(self, key):
+        """Return the cached label sequence of a request, or None.
+
+        The sequence is a dict with ``labels``, their ``time_start`` in
+        milliseconds and the ``created`` timestamp of the lookup.
+        """
+        return self._read_json("labels", key)
+
+    def put_labels(self, key, sequence):
+        self._write_json("labels", key, sequence)
+
+    def get_manifest(self, base):
+        """Return ``{label: {"time_start", "fetched"}}`` for frames materialized
+        under a ``pixel_key``, regardless of the frame range they were rendered for.
+        """
+        return self._read_json("manifests", base) or {}
+
+    def put_manifest(self, base, manifest):
+        self._write_json("manifests", base, manifest)
+
+    def prune(self):
+        """Delete least recently used frames until the cache fits ``max_bytes``."""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".npy"):
+                    path = os.path.join(dirpath, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
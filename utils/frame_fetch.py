@@ -0,0 +1,128 @@
+import contextlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Concurrent thumbnail requests per timelapse, override with TIMELAPSE_FETCH_CONCURRENCY.
+DEFAULT_CONCURRENCY = int(os.environ.get("TIMELAPSE_FETCH_CONCURRENCY", 8))
+
+# Optional semaphore shared between processes that caps concurrent Earth Engine
+# requests, installed with limit_requests.
+_request_slots = None
+
+
+def limit_requests(semaphore):
+    """Hold a slot of ``semaphore`` for every Earth Engine request in this process."""
+    global _request_slots
+    _request_slots = semaphore
+
+
+def request_slot():
+    """Return a context manager that holds one Earth Engine request slot."""
+    return _request_slots if _request_slots is not None else contextlib.nullcontext()
+
+
+def make_session(pool_size, retries=4, backoff=0.5):
+    """Return a keep-alive session whose connection pool fits ``pool_size`` workers."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class FrameFetcher:
+    """Download frame thumbnails concurrently over a pooled session.
+
+    A source is either a URL or a zero-argument callable returning one, so the
+    Earth Engine ``getThumbURL`` round trip also runs on the worker threads.
+    Results are returned in the order of the sources.
+    """
+
+    def __init__(
+        self, concurrency=DEFAULT_CONCURRENCY, retries=4, backoff=0.5, timeout=120
+    ):
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = make_session(self.concurrency, retries, backoff)
+
+    def _resolve(self, source):
+        if not callable(source):
+            return source
+        # HTTP errors are retried by the session; retry the URL request here.
+        for attempt in range(self.retries + 1):
+            try:
+                return source()
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+
+    def get(self, source):
+        """Return the body of a single source."""
+        with request_slot():
+            response = self.session.get(self._resolve(source), timeout=self.timeout)
+            response.raise_for_status()
+        return response.content
+
+    def fetch(self, sources, progress=None):
+        """Return the bodies of ``sources`` fetched concurrently, in order."""
+        sources = list(sources)
+        results = [None] * len(sources)
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {
+                executor.submit(self.get, source): index
+                for index, source in enumerate(sources)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                done += 1
+                if progress is not None:
+                    progress(done, len(sources))
+        return results
+
+    def imap(self, sources, window=None):
+        """Yield the bodies of ``sources`` in order as they arrive.
+
+        At most ``window`` responses (default twice the concurrency) are in
+        flight or waiting to be consumed, so memory stays bounded however many
+        sources there are.
+        """
+        window = max(window or 2 * self.concurrency, 1)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for source in sources:
+                pending.append(executor.submit(self.get, source))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def fetch_serial(self, sources, progress=None):
+        """Return the bodies of ``sources`` one request at a time."""
+        sources = list(sources)
+        results = []
+        for source in sources:
+            results.append(self.get(source))
+            if progress is not None:
+                progress(len(results), len(sources))
+        return results
+
+    def close(self):
+        self.session.close()
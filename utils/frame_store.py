@@ -0,0 +1,120 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+# Largest frame store kept next to a timelapse (256 MB), override with
+# TIMELAPSE_FRAME_STORE_MAX_BYTES. Larger stores are downscaled to fit.
+MAX_STORE_BYTES = int(os.environ.get("TIMELAPSE_FRAME_STORE_MAX_BYTES", 256 << 20))
+
+# Frames downscaled below this many pixels on a side are not worth scrubbing,
+# so no store is written at all.
+MIN_STORE_SIDE = 64
+
+
+def hls_dir(gif):
+    """Return the directory of the HLS renditions written next to a GIF."""
+    return f"{os.path.splitext(gif)[0]}_hls"
+
+
+def fire_path(gif):
+    """Return the path of the fire hotspot GIF rendered next to a GOES GIF."""
+    return f"{os.path.splitext(gif)[0]}_fire.gif"
+
+
+def store_paths(gif):
+    """Return the ``.npy`` frame array and ``.json`` label paths next to a GIF."""
+    stem = os.path.splitext(gif)[0]
+    return f"{stem}.npy", f"{stem}.json"
+
+
+class FrameWriter:
+    """Write the frames of a timelapse into a ``.npy`` array as they are encoded.
+
+    The array is memory-mapped with ``np.lib.format.open_memmap`` once the
+    first frame fixes its size, so frames go straight to disk. Frames are
+    downscaled so the array stays within ``max_bytes``; if that would leave
+    them smaller than ``MIN_STORE_SIDE`` nothing is stored. ``close`` moves
+    the array into place next to the GIF together with the frame labels;
+    ``abort`` deletes the partial array instead.
+    """
+
+    def __init__(self, gif, count, max_bytes=MAX_STORE_BYTES):
+        self.path, self.labels_path = store_paths(gif)
+        self.count = count
+        self.max_bytes = max_bytes
+        self.labels = []
+        self._tmp = f"{self.path}.{os.getpid()}.tmp"
+        self._array = None
+        self._size = None
+        self._skip = False
+
+    def _open(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, (self.max_bytes / (self.count * frame.nbytes)) ** 0.5)
+        size = (int(width * scale), int(height * scale))
+        if min(size) < min(MIN_STORE_SIDE, width, height):
+            self._skip = True
+            return
+        if scale < 1.0:
+            self._size = size
+        self._array = np.lib.format.open_memmap(
+            self._tmp,
+            mode="w+",
+            dtype=np.uint8,
+            shape=(self.count, size[1], size[0]) + frame.shape[2:],
+        )
+
+    def write(self, frame, label=None):
+        """Append an ``(height, width, 3)`` uint8 frame."""
+        if self._array is None and not self._skip:
+            self._open(frame)
+        if self._skip:
+            return
+        if self._size is not None:
+            frame = Image.fromarray(frame).resize(self._size, Image.BILINEAR)
+        self._array[len(self.labels)] = frame
+        self.labels.append(label)
+
+    def close(self):
+        if self._array is None:
+            return None
+        self._array.flush()
+        del self._array
+        os.replace(self._tmp, self.path)
+        with open(self.labels_path, "w") as f:
+            json.dump(self.labels, f)
+        return self.path
+
+    def abort(self):
+        if self._array is not None:
+            del self._array
+            self._array = None
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+def store_from_gif(gif):
+    """Decode a GIF once into a frame store, for timelapses rendered by geemap."""
+    with Image.open(gif) as image:
+        writer = FrameWriter(gif, image.n_frames)
+        for frame in ImageSequence.Iterator(image):
+            writer.write(np.asarray(frame.convert("RGB")))
+    return writer.close()
+
+
+def open_frames(gif):
+    """Return ``(frames, labels)`` of the frame store next to a GIF, or None.
+
+    ``frames`` is a read-only memory map, so indexing one frame reads just that
+    frame from disk without decoding anything.
+    """
+    path, labels_path = store_paths(gif)
+    try:
+        frames = np.load(path, mmap_mode="r")
+        with open(labels_path) as f:
+            labels = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return frames, labels
@@ -0,0 +1,110 @@
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import geemap.foliumap as geemap
+
+from utils import cache_path
+
+# Seconds a geocoding result stays valid (30 days), override with TIMELAPSE_GEOCODE_TTL.
+DEFAULT_TTL = int(os.environ.get("TIMELAPSE_GEOCODE_TTL", 30 * 24 * 3600))
+
+# Shorter keywords get no suggestions from the prefix index.
+MIN_PREFIX = 3
+
+Place = namedtuple("Place", ["address", "lat", "lng"])
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+class GeocodeCache:
+    """Memoize ``geemap.geocode`` in SQLite shared by all sessions and processes.
+
+    Resolved queries expire after ``ttl`` seconds and are only reused for the
+    same normalized keyword. The addresses of all places resolved so far are
+    kept in a sorted list, so places whose address starts with a keyword
+    (``"Mumbai, Maharashtra, IND"`` for ``"mumb"``) can be offered as
+    suggestions with a binary search instead of a network call.
+    """
+
+    def __init__(self, db_path=None, ttl=DEFAULT_TTL):
+        self.db_path = db_path or cache_path("geocode.db")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS queries "
+                "(query TEXT PRIMARY KEY, places TEXT, created REAL)"
+            )
+        self._names, self._places = [], []
+        self._load()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _load(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT places FROM queries WHERE created > ?",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        for (places,) in rows:
+            for place in json.loads(places):
+                self._index(Place(*place))
+
+    def _index(self, place):
+        name = normalize(place.address)
+        i = bisect.bisect_left(self._names, name)
+        if i < len(self._names) and self._names[i] == name:
+            return
+        self._names.insert(i, name)
+        self._places.insert(i, place)
+
+    def suggest(self, keyword, limit=10):
+        """Return known places whose address starts with ``keyword``."""
+        key = normalize(keyword)
+        if len(key) < MIN_PREFIX:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._names, key)
+            end = bisect.bisect_right(self._names, key + "\uffff")
+            return self._places[start : min(end, start + limit)]
+
+    def lookup(self, keyword):
+        """Return the cached places for ``keyword``, or None if unknown or expired."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT places FROM queries WHERE query = ? AND created > ?",
+                (normalize(keyword), time.time() - self.ttl),
+            ).fetchone()
+        return None if row is None else [Place(*place) for place in json.loads(row[0])]
+
+    def store(self, keyword, places):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO queries (query, places, created) "
+                "VALUES (?, ?, ?)",
+                (normalize(keyword), json.dumps(places), time.time()),
+            )
+        with self._lock:
+            for place in places:
+                self._index(place)
+
+    def geocode(self, keyword):
+        """Return a list of ``Place`` for ``keyword``, from the cache if known."""
+        places = self.lookup(keyword)
+        if places is not None:
+            return places
+        results = geemap.geocode(keyword) or []
+        places = [Place(g.address, g.lat, g.lng) for g in results]
+        # geemap returns nothing both for unknown places and on network errors,
+        # so only answers with places are worth keeping.
+        if places:
+            self.store(keyword, places)
+        return places
@@ -0,0 +1,258 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import cache_path
+from utils.memory import MemoryMeter
+from utils.render_cache import RenderCache, spec_key
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_WORKERS = int(os.environ.get("TIMELAPSE_WORKERS", 4))
+
+# Seconds finished and failed jobs are kept in the job table (7 days),
+# override with TIMELAPSE_JOB_RETENTION.
+DEFAULT_RETENTION = int(os.environ.get("TIMELAPSE_JOB_RETENTION", 7 * 24 * 3600))
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _update(db_path, job_id, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with _connect(db_path) as conn:
+        conn.execute(
+            f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+        )
+
+
+def _alive(pid):
+    """Return True if a process with ``pid`` exists on this host."""
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _init_worker():
+    from utils.ee_session import ensure_initialized
+
+    ensure_initialized()
+
+
+def _run_job(db_path, job_id, spec):
+    # Runs inside a pool process; all state goes through the job table.
+    from utils.timelapse import render_cached
+
+    _update(db_path, job_id, status=RUNNING, started=time.time())
+
+    def progress(done, total):
+        _update(db_path, job_id, frames_done=done, frames_total=total)
+
+    stats = {}
+    meter = MemoryMeter()
+    try:
+        with meter:
+            out_gif, out_mp4 = render_cached(
+                spec, RenderCache(), progress=progress, stats=stats
+            )
+        stats.update(meter.stats())
+    except Exception:
+        _update(
+            db_path,
+            job_id,
+            status=FAILED,
+            error=traceback.format_exc(limit=3),
+            finished=time.time(),
+        )
+        return
+    if out_gif is None:
+        _update(
+            db_path,
+            job_id,
+            status=FAILED,
+            error="No timelapse was produced.",
+            finished=time.time(),
+        )
+        return
+    _update(
+        db_path,
+        job_id,
+        status=DONE,
+        out_gif=out_gif,
+        out_mp4=out_mp4,
+        stats=json.dumps(stats),
+        finished=time.time(),
+    )
+
+
+class JobQueue:
+    """Render timelapse specs in a process pool, tracked in a persistent job table.
+
+    ``submit`` returns a job id immediately; callers poll ``get`` for status,
+    per-frame progress and the output paths. Identical specs that are already
+    queued or running share a single job, and cached renders finish instantly.
+    Each job records the pid of the server process whose pool runs it, so a
+    restarted server only takes over jobs whose owner has died. Finished jobs
+    are dropped after ``retention`` seconds. A job whose worker process dies
+    is marked failed, and a broken pool is replaced on the next submit.
+    """
+
+    def __init__(
+        self, db_path=None, max_workers=DEFAULT_WORKERS, retention=DEFAULT_RETENTION
+    ):
+        self.db_path = db_path or cache_path("jobs.db")
+        self.retention = retention
+        self.max_workers = max_workers
+        self.owner = os.getpid()
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        with _connect(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, key TEXT, spec TEXT, status TEXT, "
+                "frames_done INTEGER DEFAULT 0, frames_total INTEGER DEFAULT 0, "
+                "out_gif TEXT, out_mp4 TEXT, error TEXT, "
+                "created REAL, started REAL, finished REAL, stats TEXT)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "stats" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN stats TEXT")
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+        self.prune()
+        self.recover()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _dispatch(self, job_id, spec):
+        """Run a job in the pool, replacing the pool once if it is broken.
+
+        A job whose worker dies, or whose worker fails to start, is marked
+        failed by its done callback, so pollers never wait on it forever.
+        """
+        with self._lock:
+            try:
+                future = self._executor.submit(_run_job, self.db_path, job_id, spec)
+            except BrokenProcessPool:
+                self._executor.shutdown(wait=False)
+                self._executor = self._new_executor()
+                future = self._executor.submit(_run_job, self.db_path, job_id, spec)
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        if future.cancelled():
+            message = "The timelapse job was cancelled."
+        elif future.exception() is not None:
+            error = future.exception()
+            message = f"{type(error).__name__}: {error}"
+        else:
+            return
+        with _connect(self.db_path) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (FAILED, message, time.time(), job_id, QUEUED, RUNNING),
+            )
+
+    def recover(self):
+        """Resubmit jobs left queued or running by a server process that died.
+
+        Jobs of live server processes are left to them. Each orphan is claimed
+        with a conditional update, so two restarting servers never both run it.
+        """
+        with _connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT id, spec, owner FROM jobs WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        for row in rows:
+            if row["owner"] == self.owner or _alive(row["owner"]):
+                continue
+            with _connect(self.db_path) as conn:
+                claimed = conn.execute(
+                    "UPDATE jobs SET owner = ?, status = ?, frames_done = 0 "
+                    "WHERE id = ? AND owner IS ?",
+                    (self.owner, QUEUED, row["id"], row["owner"]),
+                ).rowcount
+            if claimed:
+                self._dispatch(row["id"], json.loads(row["spec"]))
+
+    def prune(self):
+        """Delete finished and failed jobs older than the retention period."""
+        with _connect(self.db_path) as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?",
+                (DONE, FAILED, time.time() - self.retention),
+            )
+
+    def submit(self, spec):
+        """Queue ``spec`` for rendering and return its job id."""
+        key = spec_key(spec)
+        with _connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?)",
+                (key, QUEUED, RUNNING),
+            ).fetchone()
+            if row is not None:
+                return row["id"]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, key, spec, status, created, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    key,
+                    json.dumps(spec, default=str),
+                    QUEUED,
+                    time.time(),
+                    self.owner,
+                ),
+            )
+        try:
+            self._dispatch(job_id, spec)
+        except Exception:
+            # Leave no queued row behind that no worker will ever pick up.
+            with _connect(self.db_path) as conn:
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            raise
+        self.prune()
+        return job_id
+
+    def get(self, job_id):
+        """Return the job record as a dict, or None for an unknown id."""
+        with _connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id, status, frames_done, frames_total, out_gif, out_mp4, "
+                "error, created, started, finished, stats FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else {}
+        return job
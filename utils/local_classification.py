@@ -0,0 +1,240 @@
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ee
+import numpy as np
+
+from utils import cache_path
+from utils.classification import (
+    BANDS,
+    LABEL,
+    TRAIN_FRACTION,
+    Classification,
+    Evaluation,
+    label_image,
+    landsat_image,
+    roi_bounds,
+    scores,
+)
+from utils.frame_fetch import DEFAULT_CONCURRENCY, request_slot
+from utils.tiling import to_mercator
+
+# Landsat surface reflectance resolution in metres.
+SCALE = 30
+
+# Largest side of one computePixels request. Seven 16-bit bands of a
+# 1024 x 1024 tile stay well under the 48 MB response limit. Override with
+# LULC_PIXEL_TILE_SIDE.
+PIXEL_TILE_SIDE = int(os.environ.get("LULC_PIXEL_TILE_SIDE", 1024))
+
+# Pixels classified per predict call, bounding the memory of one batch.
+PREDICT_BATCH = 262144
+
+# Largest box side in degrees classified locally. A 0.25 degree box is about
+# 930 x 930 Landsat pixels, 12 MB of bands. Override with LULC_LOCAL_MAX_BOX.
+LOCAL_MAX_BOX = float(os.environ.get("LULC_LOCAL_MAX_BOX", 0.25))
+
+# scikit-learn counterparts of the Earth Engine classifiers, trained with all
+# cores where the learner supports it.
+LEARNERS = {
+    "Random Forest": ("ensemble", "RandomForestClassifier", {"n_estimators": 50}),
+    "KNN": ("neighbors", "KNeighborsClassifier", {"n_neighbors": 100}),
+    "Gradient Tree Boost": (
+        "ensemble",
+        "HistGradientBoostingClassifier",
+        {"max_iter": 50},
+    ),
+    "SVM": ("svm", "SVC", {}),
+    "Decision Tree": ("tree", "DecisionTreeClassifier", {}),
+}
+PARALLEL = {"RandomForestClassifier", "KNeighborsClassifier"}
+
+
+def available():
+    """Return True when scikit-learn is installed and the local engine can run."""
+    return importlib.util.find_spec("sklearn") is not None
+
+
+def make_learner(classifier, seed=0):
+    """Return an untrained scikit-learn learner for a page classifier name."""
+    module, name, params = LEARNERS[classifier]
+    cls = getattr(importlib.import_module(f"sklearn.{module}"), name)
+    params = dict(params)
+    if name in PARALLEL:
+        params["n_jobs"] = -1
+    if "random_state" in cls().get_params():
+        params["random_state"] = seed
+    return cls(**params)
+
+
+def pixel_grid(bounds, scale=SCALE, max_side=PIXEL_TILE_SIDE):
+    """Split ``bounds`` into EPSG:3857 computePixels grids of ``scale`` metres.
+
+    Returns ``(width, height, tiles)`` where each tile is ``(x, y, grid)``.
+    """
+    west, south = to_mercator(bounds[0], bounds[1])
+    east, north = to_mercator(bounds[2], bounds[3])
+    width = max(1, math.ceil((east - west) / scale))
+    height = max(1, math.ceil((north - south) / scale))
+    tiles = []
+    for y in range(0, height, max_side):
+        for x in range(0, width, max_side):
+            grid = {
+                "dimensions": {
+                    "width": min(max_side, width - x),
+                    "height": min(max_side, height - y),
+                },
+                "affineTransform": {
+                    "scaleX": scale,
+                    "shearX": 0,
+                    "translateX": west + x * scale,
+                    "shearY": 0,
+                    "scaleY": -scale,
+                    "translateY": north - y * scale,
+                },
+                "crsCode": "EPSG:3857",
+            }
+            tiles.append((x, y, grid))
+    return width, height, tiles
+
+
+def _fetch_tile(image, grid, names):
+    with request_slot():
+        block = ee.data.computePixels(
+            {"expression": image, "fileFormat": "NUMPY_NDARRAY", "grid": grid}
+        )
+    return np.stack([block[name] for name in names], axis=-1).astype(np.uint16)
+
+
+def download(bounds, bands=BANDS, scale=SCALE, concurrency=DEFAULT_CONCURRENCY):
+    """Download the bands and ESRI labels over ``bounds`` as one array.
+
+    Returns a ``(height, width, len(bands) + 1)`` uint16 array whose last
+    channel is the label. Tiles are requested concurrently and the result is
+    kept on disk, so each ROI is downloaded once for every classifier.
+    """
+    payload = json.dumps(
+        {"bounds": [round(b, 6) for b in bounds], "bands": list(bands), "scale": scale}
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+    path = cache_path("pixels", f"{digest}.npy")
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+
+    roi = ee.Geometry.Rectangle(list(bounds))
+    image = landsat_image(roi, bands).addBands(label_image(roi).select(LABEL))
+    names = list(bands) + [LABEL]
+    width, height, tiles = pixel_grid(bounds, scale)
+    pixels = np.zeros((height, width, len(names)), dtype=np.uint16)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        blocks = executor.map(lambda tile: _fetch_tile(image, tile[2], names), tiles)
+        for (x, y, _), block in zip(tiles, blocks):
+            pixels[y : y + block.shape[0], x : x + block.shape[1]] = block
+
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, pixels)
+    os.replace(tmp, path)
+    return pixels
+
+
+def sample_split(pixels, num_pixels=1000, seed=0):
+    """Return ``(X_train, y_train, X_val, y_val)`` drawn from labelled pixels.
+
+    Mirrors the server-side ``sample`` and ``randomColumn`` split: up to
+    ``num_pixels`` valid pixels are drawn with ``seed`` and ``TRAIN_FRACTION``
+    of them go to training.
+    """
+    flat = pixels.reshape(-1, pixels.shape[-1])
+    valid = np.flatnonzero((flat[:, -1] > 0) & flat[:, :-1].any(axis=1))
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(valid, size=min(num_pixels, valid.size), replace=False)
+    train = rng.random(chosen.size) <= TRAIN_FRACTION
+    features = flat[chosen, :-1].astype(np.float32)
+    labels = flat[chosen, -1].astype(np.int32)
+    return features[train], labels[train], features[~train], labels[~train]
+
+
+def predict(model, pixels, batch=PREDICT_BATCH):
+    """Classify every pixel of a ``(height, width, bands + 1)`` array.
+
+    Pixels without data are left as class 0.
+    """
+    height, width = pixels.shape[:2]
+    flat = pixels.reshape(-1, pixels.shape[-1])[:, :-1]
+    classes = np.zeros(height * width, dtype=np.uint8)
+    for start in range(0, flat.shape[0], batch):
+        block = flat[start : start + batch]
+        valid = block.any(axis=1)
+        if valid.any():
+            predicted = model.predict(block[valid].astype(np.float32))
+            classes[start : start + batch][valid] = predicted
+    return classes.reshape(height, width)
+
+
+def colorize(classes, palette, vmin=1):
+    """Return an RGBA image of a class array, with class 0 transparent."""
+    colors = np.zeros((256, 4), dtype=np.uint8)
+    for i, color in enumerate(palette):
+        color = color.lstrip("#")
+        colors[vmin + i] = [int(color[j : j + 2], 16) for j in (0, 2, 4)] + [255]
+    return colors[classes]
+
+
+def _check_box(box_size):
+    if box_size > LOCAL_MAX_BOX:
+        raise ValueError(
+            f"Boxes larger than {LOCAL_MAX_BOX} degrees are not classified locally."
+        )
+
+
+def classify(key, vis_params):
+    """Train and apply the classifier of a ``classification_key`` locally."""
+    center_lat, center_lon, box_size, classifier, bands, num_pixels, seed = key[:7]
+    _check_box(box_size)
+    pixels = download(roi_bounds(center_lat, center_lon, box_size), bands)
+    features, labels, _, _ = sample_split(pixels, num_pixels, seed)
+    model = make_learner(classifier, seed).fit(features, labels)
+    image = colorize(predict(model, pixels), vis_params["palette"], vis_params["min"])
+    return Classification(model, image, None, time.time())
+
+
+def confusion_matrix(actual, predicted):
+    """Return the ``[actual][predicted]`` counts indexed by class value."""
+    size = int(max(actual.max(initial=0), predicted.max(initial=0))) + 1
+    counts = np.bincount(actual * size + predicted, minlength=size * size)
+    return counts.reshape(size, size)
+
+
+def evaluate(classifier, split, seed=0):
+    """Fit one learner on a ``sample_split`` and score it on its validation part."""
+    features, labels, val_features, val_labels = split
+    start = time.perf_counter()
+    model = make_learner(classifier, seed).fit(features, labels)
+    predicted = model.predict(val_features).astype(np.int64)
+    seconds = time.perf_counter() - start
+    matrix = confusion_matrix(val_labels.astype(np.int64), predicted)
+    accuracy, kappa = scores(matrix)
+    return Evaluation(
+        classifier,
+        seconds,
+        accuracy,
+        kappa,
+        matrix.tolist(),
+    )
+
+
+def compare(key, classifiers):
+    """Fit and validate ``classifiers`` concurrently on one local sample."""
+    center_lat, center_lon, box_size, _, bands, num_pixels, seed = key[:7]
+    _check_box(box_size)
+    pixels = download(roi_bounds(center_lat, center_lon, box_size), bands)
+    split = sample_split(pixels, num_pixels, seed)
+    with ThreadPoolExecutor(max_workers=len(classifiers)) as executor:
+        return list(
+            executor.map(lambda name: evaluate(name, split, seed), classifiers)
+        )
@@ -0,0 +1,50 @@
+import os
+import resource
+import threading
+
+
+def current_rss():
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the lifetime peak in KiB, the best available elsewhere.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMeter:
+    """Sample the RSS of the current process to find a job's high-water mark.
+
+    Pool workers are reused across jobs, so the lifetime peak reported by the
+    OS is not per job; the meter samples only while it is active.
+    """
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    def stats(self):
+        mb = 1024**2
+        return {
+            "peak_rss_mb": round(self.peak / mb, 1),
+            "rss_growth_mb": round((self.peak - self.baseline) / mb, 1),
+        }
@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import json
+import os
+
+import geemap.foliumap as geemap
+import geopandas as gpd
+import requests
+from shapely.geometry import box
+
+from utils import cache_path
+from utils.tiling import geojson_bounds
+
+GEEMAP_DATA = "https://raw.githubusercontent.com/giswqs/geemap/master/examples/data"
+
+# Boundary datasets geemap.add_overlay accepts by name.
+BUILTIN = {
+    name: f"{GEEMAP_DATA}/{name}.geojson"
+    for name in ("continents", "countries", "us_states", "china")
+}
+
+# Simplification tolerances in degrees of the stored levels of detail, finest
+# first. Level 0 is the dataset as downloaded.
+TOLERANCES = (0, 0.001, 0.005, 0.02, 0.1)
+
+# Margin around the ROI, as a fraction of its extent, kept when clipping so no
+# clip edge is drawn inside the frame.
+CLIP_MARGIN = 0.05
+
+
+def source_url(overlay_data):
+    """Return the GeoJSON URL of an overlay, or None for Earth Engine assets."""
+    url = BUILTIN.get(str(overlay_data).lower(), str(overlay_data))
+    if url.startswith("http") and url.endswith(".geojson"):
+        return url
+    return None
+
+
+def level_for(bounds, dimensions):
+    """Return the coarsest level whose tolerance stays below one output pixel."""
+    degrees_per_pixel = max(bounds[2] - bounds[0], bounds[3] - bounds[1]) / dimensions
+    level = 0
+    for i, tolerance in enumerate(TOLERANCES):
+        if tolerance <= degrees_per_pixel:
+            level = i
+    return level
+
+
+@functools.lru_cache(maxsize=32)
+def _read(path):
+    with open(path) as f:
+        return gpd.GeoDataFrame.from_features(json.load(f), crs="EPSG:4326")
+
+
+class OverlayStore:
+    """Local store of boundary overlays at several levels of detail.
+
+    Each dataset is downloaded once and simplified into ``TOLERANCES`` levels
+    stored as GeoJSON. A render reads the level matching its output pixel size
+    and clips it to the ROI, so Earth Engine receives only the few vertices
+    that are visible in the frame.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.path.dirname(cache_path("overlays", ".keep"))
+
+    def _dir(self, url):
+        return os.path.join(self.root, hashlib.sha256(url.encode()).hexdigest()[:16])
+
+    def _build(self, url):
+        directory = self._dir(url)
+        response = requests.get(url, timeout=120)
+        response.raise_for_status()
+        gdf = gpd.GeoDataFrame.from_features(response.json(), crs="EPSG:4326")
+        os.makedirs(directory, exist_ok=True)
+        for level, tolerance in enumerate(TOLERANCES):
+            geometry = gdf.geometry
+            if tolerance:
+                geometry = geometry.simplify(tolerance, preserve_topology=True)
+            path = os.path.join(directory, f"lod{level}.geojson")
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(gdf.set_geometry(geometry).to_json())
+            os.replace(tmp, path)
+
+    def level(self, url, level):
+        """Return one level of detail of an overlay as a GeoDataFrame."""
+        path = os.path.join(self._dir(url), f"lod{level}.geojson")
+        if not os.path.exists(path):
+            self._build(url)
+        return _read(path)
+
+    def get(self, overlay_data, roi, dimensions):
+        """Return the overlay clipped to ``roi`` as a GeoJSON dict.
+
+        Returns None when ``overlay_data`` is not a GeoJSON dataset (e.g. an
+        Earth Engine asset id) and an empty FeatureCollection when nothing of
+        the overlay falls inside the ROI.
+        """
+        url = source_url(overlay_data)
+        if url is None:
+            return None
+        west, south, east, north = geojson_bounds(roi)
+        margin = max(east - west, north - south) * CLIP_MARGIN
+        bounds = (west - margin, south - margin, east + margin, north + margin)
+        gdf = self.level(url, level_for(bounds, dimensions))
+        clipped = gdf.iloc[gdf.sindex.query(box(*bounds))].clip(box(*bounds))
+        return json.loads(clipped.to_json())
+
+
+def resolve_overlay(params, roi, store=None):
+    """Return geemap keyword arguments with ``overlay_data`` replaced by a
+    clipped, simplified ee.FeatureCollection where a local copy is possible.
+    """
+    if params.get("overlay_data") is None or roi is None:
+        return params
+    overlay = (store or OverlayStore()).get(
+        params["overlay_data"], roi, params.get("dimensions", 768)
+    )
+    if overlay is None:
+        return params
+    if not overlay["features"]:
+        return dict(params, overlay_data=None)
+    return dict(params, overlay_data=geemap.geojson_to_ee(overlay, geodesic=False))
@@ -0,0 +1,644 @@
+import functools
+import hashlib
+import io
+import json
+import os
+import time
+
+import ee
+import geemap.foliumap as geemap
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.collections import GOES, GOES_FIRE, LANDSAT, MODIS_NDVI, SENTINEL2
+from utils.encode import StreamingEncoder
+from utils.frame_cache import FrameCache
+from utils.frame_fetch import FrameFetcher
+from utils.frame_store import FrameWriter, fire_path, hls_dir
+from utils.overlays import resolve_overlay
+from utils.render_cache import geometry_fingerprint
+from utils.tiling import MAX_TILE_SIDE, geojson_bounds, mosaic, plan_tiles
+
+_OVERLAY_PARAMS = ("overlay_data", "overlay_color", "overlay_width", "overlay_opacity")
+
+# Spec parameters that change the pixels of individual frames. Everything else
+# is styling (applied at encode time) or selects which frames are included.
+# Only FRAME_COLLECTIONS keep frames to restyle; MODIS LST, Ocean Color,
+# Any-collection and NAIP are rendered by geemap in one request, so any
+# change to their spec, styling included, renders them again from scratch.
+PIXEL_PARAMS = {
+    LANDSAT: (
+        "start_date",
+        "end_date",
+        "bands",
+        "apply_fmask",
+        "frequency",
+        "date_format",
+        "dimensions",
+    )
+    + _OVERLAY_PARAMS,
+    MODIS_NDVI: ("data", "band", "dimensions") + _OVERLAY_PARAMS,
+    GOES: ("data", "scan", "date_format", "dimensions") + _OVERLAY_PARAMS,
+}
+PIXEL_PARAMS[SENTINEL2] = PIXEL_PARAMS[LANDSAT]
+PIXEL_PARAMS[GOES_FIRE] = PIXEL_PARAMS[GOES]
+
+# Spec parameters that select the range of frames.
+RANGE_PARAMS = {
+    LANDSAT: ("start_year", "end_year"),
+    SENTINEL2: ("start_year", "end_year"),
+    MODIS_NDVI: ("start_date", "end_date"),
+    GOES: ("start_date", "end_date"),
+    GOES_FIRE: ("start_date", "end_date"),
+}
+
+# A period's composite can still change while late scenes arrive, so frames
+# fetched before this many days after the period ended are refetched.
+SETTLE_DAYS = int(os.environ.get("TIMELAPSE_SETTLE_DAYS", 30))
+PERIOD_DAYS = {"year": 366, "quarter": 92, "month": 31}
+NDVI_PERIOD_DAYS = 16
+
+# Frames fetched ahead of the encoder, override with TIMELAPSE_FRAME_WINDOW.
+FRAME_WINDOW = int(os.environ.get("TIMELAPSE_FRAME_WINDOW", 8))
+
+GOES_BANDS = ["CMI_C02", "CMI_GREEN", "CMI_C01"]
+GOES_DATE_FORMAT = "YYYY-MM-dd HH:mm"
+
+# Fire detection (FDC) mask codes of processed, saturated, cloudy and
+# high/medium/low probability fire pixels. Codes 16-29 are undefined.
+FIRE_MASK_CODES = (10, 11, 12, 13, 14, 15, 30, 31, 32, 33, 34, 35)
+FIRE_COLOR = "ff0000"
+
+NDVI_PALETTE = [
+    "FFFFFF", "CE7E45", "DF923D", "F1B555", "FCD163", "99B718", "74A901",
+    "66A000", "529400", "3E8601", "207401", "056201", "004C00", "023B01",
+    "012E01", "011D01", "011301",
+]
+
+
+def _digest(payload):
+    payload = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pixel_key(spec):
+    """Return the key shared by all frames of the same ROI, collection and bands."""
+    names = PIXEL_PARAMS[spec["collection"]]
+    return _digest(
+        {
+            "collection": spec["collection"],
+            "roi": geometry_fingerprint(spec["roi"]),
+            "params": {name: spec["params"].get(name) for name in names},
+        }
+    )
+
+
+def frame_key(base, label):
+    """Return the key of one frame given its spec's ``pixel_key``."""
+    return _digest([base, label])
+
+
+def sequence_key(spec):
+    """Return the key of the frame label sequence for a spec's frame range."""
+    params = spec["params"]
+    return _digest(
+        [pixel_key(spec)]
+        + [params.get(name) for name in RANGE_PARAMS[spec["collection"]]]
+    )
+
+
+def base_spec(spec):
+    """Return the spec whose frames a render starts from.
+
+    A GOES fire timelapse is the plain GOES timelapse with fire pixels
+    composited on top, so both share the same cached base frames.
+    """
+    if spec["collection"] == GOES_FIRE:
+        return dict(spec, collection=GOES)
+    return spec
+
+
+def roi_geometry(spec):
+    return geemap.geojson_to_ee(spec["roi"], geodesic=False).geometry()
+
+
+def frame_collection(spec, region):
+    """Return the visualized ee.ImageCollection for a spec, one image per frame.
+
+    Every image carries its frame label in the ``system:date`` property.
+    """
+    collection, params = spec["collection"], spec["params"]
+
+    if collection in (LANDSAT, SENTINEL2):
+        timeseries = (
+            geemap.landsat_timeseries
+            if collection == LANDSAT
+            else geemap.sentinel2_timeseries
+        )
+        col = timeseries(
+            roi=region,
+            start_year=params["start_year"],
+            end_year=params["end_year"],
+            start_date=params["start_date"],
+            end_date=params["end_date"],
+            apply_fmask=params["apply_fmask"],
+            frequency=params["frequency"],
+            date_format=params.get("date_format"),
+        )
+        vis = {"bands": params["bands"], "min": 0, "max": 0.4, "gamma": [1, 1, 1]}
+    elif collection == MODIS_NDVI:
+        asset_id = (
+            "MODIS/061/MOD13A2" if params["data"] == "Terra" else "MODIS/061/MYD13A2"
+        )
+        col = (
+            ee.ImageCollection(asset_id)
+            .filterDate(params["start_date"], params["end_date"])
+            .select(params["band"])
+            .map(lambda img: img.set("system:date", img.date().format("YYYY-MM-dd")))
+        )
+        vis = {"min": 0, "max": 9000, "palette": NDVI_PALETTE}
+    elif collection == GOES:
+        date_format = params.get("date_format") or GOES_DATE_FORMAT
+        col = geemap.goes_timeseries(
+            params["start_date"],
+            params["end_date"],
+            params.get("data", "GOES-17"),
+            params.get("scan", "full_disk"),
+            region,
+        ).map(lambda img: img.set("system:date", img.date().format(date_format)))
+        vis = {"bands": GOES_BANDS, "min": 0, "max": 0.8}
+    else:
+        raise ValueError(f"Frames are not supported for {collection}")
+
+    col = col.map(
+        lambda img: img.visualize(**vis)
+        .clip(region)
+        .copyProperties(img, ["system:time_start", "system:date"])
+    )
+    params = resolve_overlay(params, spec["roi"])
+    if params.get("overlay_data") is not None:
+        col = geemap.add_overlay(
+            col,
+            params["overlay_data"],
+            params.get("overlay_color", "black"),
+            params.get("overlay_width", 1),
+            params.get("overlay_opacity", 1.0),
+            region,
+        )
+    return col
+
+
+def fire_collection(spec, region):
+    """Return the fire pixels of a GOES spec as transparent RGBA images.
+
+    Images carry the same ``system:date`` labels as the base GOES frames;
+    everything but the fire pixels is masked, so their thumbnails are tiny.
+    """
+    params = spec["params"]
+    satellite = params.get("data", "GOES-17")[-2:]
+    product = "FDCC" if params.get("scan") == "conus" else "FDCF"
+    date_format = params.get("date_format") or GOES_DATE_FORMAT
+
+    def fire(img):
+        fire_pixels = img.select("Mask").remap(
+            list(FIRE_MASK_CODES), [1] * len(FIRE_MASK_CODES), 0
+        )
+        return (
+            fire_pixels.selfMask()
+            .visualize(palette=[FIRE_COLOR])
+            .clip(region)
+            .set("system:date", img.date().format(date_format))
+        )
+
+    return (
+        ee.ImageCollection(f"NOAA/GOES/{satellite}/{product}")
+        .filterDate(params["start_date"], params["end_date"])
+        .map(fire)
+    )
+
+
+def frame_image(col, label):
+    return ee.Image(col.filter(ee.Filter.eq("system:date", label)).first())
+
+
+def fire_image(col, label):
+    # Timesteps without a fire product get a fully transparent image.
+    matches = col.filter(ee.Filter.eq("system:date", label))
+    empty = ee.Image(0).selfMask().visualize(palette=[FIRE_COLOR])
+    return ee.Image(ee.Algorithms.If(matches.size().gt(0), matches.first(), empty))
+
+
+def thumbnail_source(image, region, dimensions):
+    """Return a lazy thumbnail URL source for one image (or one tile of it)."""
+    thumb_params = {
+        "region": region,
+        "dimensions": dimensions,
+        "format": "png",
+        "crs": "EPSG:3857",
+    }
+    return lambda: image.getThumbURL(thumb_params)
+
+
+def decode(png, mode="RGB"):
+    return np.asarray(Image.open(io.BytesIO(png)).convert(mode))
+
+
+def composite(base, overlay):
+    """Alpha-blend an RGBA ``overlay`` onto an RGB ``base`` frame."""
+    alpha = overlay[..., 3:4].astype(np.float32) / 255
+    blended = base * (1 - alpha) + overlay[..., :3] * alpha
+    return blended.round().astype(np.uint8)
+
+
+def iter_fetched_frames(
+    spec, col, labels, region, fetcher, window=None, image=frame_image, mode="RGB"
+):
+    """Yield one frame per label, in order, tiling frames above MAX_TILE_SIDE.
+
+    Tiles of consecutive frames share the fetcher's window and are mosaicked
+    locally, so large ROIs render at full resolution. At most ``window`` frames
+    are in flight at any time. ``image(col, label)`` selects the image of a
+    label and ``mode`` is the Pillow mode frames are decoded to.
+    """
+    window = window or FRAME_WINDOW
+    dimensions = spec["params"].get("dimensions", 768)
+    if dimensions <= MAX_TILE_SIDE:
+        sources = (
+            thumbnail_source(image(col, label), region, dimensions)
+            for label in labels
+        )
+        for png in fetcher.imap(sources, window):
+            yield decode(png, mode)
+        return
+
+    width, height, tiles = plan_tiles(geojson_bounds(spec["roi"]), dimensions)
+    sources = (
+        thumbnail_source(
+            image(col, label),
+            ee.Geometry.Rectangle(list(tile.bounds), "EPSG:3857", False),
+            f"{tile.width}x{tile.height}",
+        )
+        for label in labels
+        for tile in tiles
+    )
+    arrays = []
+    for png in fetcher.imap(sources, window * len(tiles)):
+        arrays.append(decode(png, mode))
+        if len(arrays) == len(tiles):
+            yield mosaic(tiles, arrays, width, height, len(mode))
+            arrays = []
+
+
+def _style(params):
+    """Normalize the annotation keywords of the different geemap renderers."""
+    return {
+        "title": params.get("title"),
+        "title_xy": params.get("title_xy", ("2%", "90%")),
+        "add_text": params.get("add_text", True),
+        "text_xy": params.get("text_xy", params.get("xy", ("3%", "3%"))),
+        "font_type": params.get("font_type", "arial.ttf"),
+        "font_size": params.get("font_size", 20),
+        "font_color": params.get("font_color", "white"),
+        "add_progress_bar": params.get("add_progress_bar", True),
+        "progress_bar_color": params.get("progress_bar_color", "white"),
+        "progress_bar_height": params.get("progress_bar_height", 5),
+        "fps": params.get("frames_per_second", params.get("framesPerSecond", 5)),
+        "fading": params.get("fading", 0),
+        "loop": params.get("loop", 0),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _font(font_type, size):
+    bundled = os.path.join(os.path.dirname(geemap.__file__), "data", "fonts", font_type)
+    for path in (bundled, font_type):
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
+    return ImageFont.load_default()
+
+
+def _xy(xy, size):
+    def coord(value, extent):
+        if isinstance(value, str) and value.endswith("%"):
+            return int(float(value[:-1]) / 100 * extent)
+        return int(value)
+
+    return coord(xy[0], size[0]), coord(xy[1], size[1])
+
+
+def annotate(frame, label, index, count, style):
+    """Draw the title, frame label and progress bar onto an RGB frame."""
+    draw = ImageDraw.Draw(frame)
+    font = _font(style["font_type"], style["font_size"])
+    if style["title"]:
+        draw.text(
+            _xy(style["title_xy"], frame.size),
+            style["title"],
+            fill=style["font_color"],
+            font=font,
+        )
+    if style["add_text"] and label:
+        draw.text(
+            _xy(style["text_xy"], frame.size),
+            str(label),
+            fill=style["font_color"],
+            font=font,
+        )
+    if style["add_progress_bar"]:
+        width, height = frame.size
+        bar = style["progress_bar_height"]
+        draw.rectangle(
+            [0, height - bar, int(width * (index + 1) / count), height],
+            fill=style["progress_bar_color"],
+        )
+    return frame
+
+
+class _Output:
+    """Annotate the frames of one GIF (and its MP4/HLS) as they are written."""
+
+    def __init__(self, out_gif, count, params, frame_store=True):
+        self.out_gif, self.count = out_gif, count
+        self.style = _style(params)
+        self.out_mp4 = out_gif.replace(".gif", ".mp4") if params.get("mp4") else None
+        self.out_hls = (
+            hls_dir(out_gif) if self.out_mp4 and params.get("renditions") else None
+        )
+        self.steps = int(float(self.style["fading"] or 0) * self.style["fps"])
+        self.encoder = None
+        self.store = FrameWriter(out_gif, count) if frame_store else None
+        self.previous = None
+        self.index = 0
+
+    def write(self, label, array):
+        style = self.style
+        if self.encoder is None:
+            height, width = array.shape[:2]
+            self.encoder = StreamingEncoder(
+                self.out_gif,
+                width,
+                height,
+                style["fps"],
+                style["loop"],
+                self.out_mp4,
+                self.out_hls,
+            )
+        frame = annotate(Image.fromarray(array), label, self.index, self.count, style)
+        if self.previous is not None:
+            for step in range(1, self.steps + 1):
+                blended = Image.blend(self.previous, frame, step / (self.steps + 1))
+                self.encoder.write(np.asarray(blended))
+        self.encoder.write(np.asarray(frame))
+        if self.store is not None:
+            self.store.write(np.asarray(frame), label)
+        self.previous = frame
+        self.index += 1
+
+    def close(self):
+        timings = self.encoder.close()
+        if self.store is not None:
+            self.store.close()
+        return timings
+
+    def abort(self):
+        if self.encoder is not None:
+            self.encoder.abort()
+        if self.store is not None:
+            self.store.abort()
+
+
+def encode_frames(frames, count, params, out_gif, stats=None, fire_gif=None):
+    """Annotate ``(label, array)`` frames and stream them into the encoders.
+
+    This is the only stage styling affects. Frames are consumed one at a time
+    and cross-faded frames are blended on the fly, so at most two annotated
+    frames are held at once. The annotated frames are also written to a frame
+    store next to the GIF for scrubbing. Encode times per output are recorded
+    in ``stats``.
+
+    With ``fire_gif`` frames are ``(label, array, fire_array)`` and the fire
+    composites are encoded into that GIF in the same pass.
+    """
+    outputs = [_Output(out_gif, count, params)]
+    if fire_gif is not None:
+        outputs.append(_Output(fire_gif, count, dict(params, mp4=False), False))
+    written = False
+    try:
+        for label, *arrays in frames:
+            for output, array in zip(outputs, arrays):
+                output.write(label, array)
+            written = True
+        if not written:
+            return None
+        timings = [output.close() for output in outputs]
+    except BaseException:
+        # Leave no ffmpeg process, partial output or memory-mapped frames behind.
+        for output in outputs:
+            output.abort()
+        raise
+    if stats is not None:
+        for prefix, times in zip(("", "fire_"), timings):
+            for name, seconds in times.items():
+                stats[f"encode_{prefix}{name}_seconds"] = round(seconds, 3)
+    return out_gif
+
+
+def is_settled(spec, time_start, checked_at):
+    """Return True if the period starting at ``time_start`` (ms) was final at
+    ``checked_at`` (epoch seconds)."""
+    if time_start is None or spec["collection"] in (GOES, GOES_FIRE):
+        # Single GOES scans never change once published.
+        return True
+    if spec["collection"] == MODIS_NDVI:
+        days = NDVI_PERIOD_DAYS
+    else:
+        days = PERIOD_DAYS.get(spec["params"].get("frequency"), PERIOD_DAYS["year"])
+    return checked_at >= time_start / 1000 + (days + SETTLE_DAYS) * 86400
+
+
+def frames_settled(spec, cache=None):
+    """Return True if the last period of a rendered spec has settled by now.
+
+    Reads the frame sequence cached by the render, so it makes no request.
+    """
+    source = base_spec(spec)
+    sequence = (cache or FrameCache()).get_labels(sequence_key(source))
+    if not sequence or not sequence["labels"]:
+        return False
+    return is_settled(source, sequence["time_start"][-1], time.time())
+
+
+def frame_sequence(spec, col, cache):
+    """Return the labels and period starts of a spec's frames.
+
+    This is the only Earth Engine request needed when every frame is cached. A
+    cached sequence whose last period was still open is refreshed once a day.
+    """
+    key = sequence_key(spec)
+    sequence = cache.get_labels(key)
+    if sequence is not None and sequence["labels"]:
+        last_start = sequence["time_start"][-1]
+        if (
+            is_settled(spec, last_start, sequence["created"])
+            or time.time() - sequence["created"] < 86400
+        ):
+            return sequence
+
+    info = ee.Dictionary(
+        {
+            "labels": col.aggregate_array("system:date"),
+            "time_start": col.aggregate_array("system:time_start"),
+        }
+    ).getInfo()
+    time_start = info["time_start"]
+    if len(time_start) != len(info["labels"]):
+        time_start = [None] * len(info["labels"])
+    sequence = {
+        "labels": info["labels"],
+        "time_start": time_start,
+        "created": time.time(),
+    }
+    cache.put_labels(key, sequence)
+    return sequence
+
+
+def plan_incremental(spec, sequence, cache):
+    """Return the indices of frames in ``sequence`` that must be fetched.
+
+    Frames materialized by any earlier render of the same ROI, collection and
+    bands are reused; periods that were never fetched or were fetched before
+    they settled are returned.
+    """
+    base = pixel_key(spec)
+    manifest = cache.get_manifest(base)
+    missing = []
+    for index, (label, time_start) in enumerate(
+        zip(sequence["labels"], sequence["time_start"])
+    ):
+        entry = manifest.get(label)
+        if (
+            entry is None
+            or not is_settled(spec, time_start, entry["fetched"])
+            or not cache.has(frame_key(base, label))
+        ):
+            missing.append(index)
+    return missing
+
+
+def overlay_fire(spec, frames, labels, region, fetcher, cache, stats=None):
+    """Composite fire masks onto a stream of ``(label, array)`` GOES frames.
+
+    Yields ``(label, array, composited)``. Masks are cached like frames, so
+    only timesteps never seen before are requested, as small transparent PNGs
+    fetched ahead of the encoder.
+    """
+    fires = fire_collection(spec, region)
+    base = pixel_key(dict(spec, collection=GOES_FIRE))
+    missing = [label for label in labels if not cache.has(frame_key(base, label))]
+
+    def fetch(wanted):
+        return iter_fetched_frames(
+            spec, fires, wanted, region, fetcher, image=fire_image, mode="RGBA"
+        )
+
+    fetched = fetch(missing)
+    missing = set(missing)
+    for label, array in frames:
+        key = frame_key(base, label)
+        if label in missing:
+            mask = next(fetched)
+            cache.put(key, mask)
+        else:
+            mask = cache.get(key)
+            if mask is None:
+                # Pruned by another process since planning.
+                mask = next(fetch([label]))
+        yield label, array, composite(array, mask)
+    if stats is not None:
+        stats["fire_frames_fetched"] = len(missing)
+
+
+def render_frames(
+    spec, out_gif, progress=None, fetcher=None, cache=None, stats=None
+):
+    """Render a frame-based timelapse and return the path of the GIF, or None.
+
+    Fetch, annotate and encode run as one streaming generator pipeline: cached
+    frames are read from disk as the encoder reaches them and missing frames
+    are fetched at most FRAME_WINDOW ahead, so memory does not grow with the
+    frame count. Only periods missing from the frame cache hit Earth Engine,
+    so moving the end year forward fetches just the new periods. GOES fire
+    timelapses reuse the plain GOES frames and only fetch the fire pixels; a
+    GOES spec with the ``fire`` parameter writes both GIFs in the same pass,
+    the fire one to ``fire_path(out_gif)``.
+    """
+    progress = progress or (lambda done, total: None)
+    cache = cache or FrameCache()
+    fetcher = fetcher or FrameFetcher()
+    source = base_spec(spec)
+    region = roi_geometry(spec)
+    col = frame_collection(source, region)
+
+    sequence = frame_sequence(source, col, cache)
+    labels = sequence["labels"]
+    if not labels:
+        return None
+
+    base = pixel_key(source)
+    missing = set(plan_incremental(source, sequence, cache))
+    manifest = cache.get_manifest(base)
+    fetched_at = time.time()
+
+    def fetch_one(label):
+        return next(iter_fetched_frames(source, col, [label], region, fetcher))
+
+    def frames():
+        fetched = iter_fetched_frames(
+            source, col, [labels[i] for i in sorted(missing)], region, fetcher
+        )
+        done = len(labels) - len(missing)
+        progress(done, len(labels))
+        for index, label in enumerate(labels):
+            if index in missing:
+                array = next(fetched)
+                cache.put(frame_key(base, label), array)
+                manifest[label] = {
+                    "time_start": sequence["time_start"][index],
+                    "fetched": fetched_at,
+                }
+                done += 1
+                progress(done, len(labels))
+            else:
+                array = cache.get(frame_key(base, label))
+                if array is None:
+                    # Pruned by another process since planning.
+                    array = fetch_one(label)
+            yield label, array
+
+    stream = frames()
+    fire_gif = None
+    if spec["collection"] == GOES_FIRE:
+        stream = (
+            (label, composited)
+            for label, _, composited in overlay_fire(
+                spec, stream, labels, region, fetcher, cache, stats
+            )
+        )
+    elif spec["collection"] == GOES and spec["params"].get("fire"):
+        stream = overlay_fire(spec, stream, labels, region, fetcher, cache, stats)
+        fire_gif = fire_path(out_gif)
+    try:
+        out_gif = encode_frames(
+            stream, len(labels), spec["params"], out_gif, stats, fire_gif
+        )
+    finally:
+        fetcher.close()
+    if missing:
+        cache.put_manifest(base, manifest)
+        cache.prune()
+    if stats is not None:
+        stats["frames_fetched"] = len(missing)
+        stats["frames_reused"] = len(labels) - len(missing)
+    return out_gif
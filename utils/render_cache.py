@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from utils import cache_path
+from utils.frame_store import fire_path, hls_dir, store_paths
+
+# Default size bound of the render cache (2 GB), override with TIMELAPSE_CACHE_MAX_BYTES.
+DEFAULT_MAX_BYTES = int(os.environ.get("TIMELAPSE_CACHE_MAX_BYTES", 2 * 1024**3))
+
+# Seconds a render whose last period has not settled yet is served before it
+# is rendered again (1 day), override with TIMELAPSE_UNSETTLED_TTL.
+UNSETTLED_TTL = int(os.environ.get("TIMELAPSE_UNSETTLED_TTL", 24 * 3600))
+
+
+def _round_coords(coords, ndigits=7):
+    if isinstance(coords, (list, tuple)):
+        return [_round_coords(c, ndigits) for c in coords]
+    return round(float(coords), ndigits)
+
+
+def _geometries(geojson):
+    if geojson is None:
+        return []
+    if hasattr(geojson, "__geo_interface__"):
+        geojson = geojson.__geo_interface__
+    kind = geojson.get("type")
+    if kind == "FeatureCollection":
+        return [g for f in geojson["features"] for g in _geometries(f)]
+    if kind == "Feature":
+        return _geometries(geojson.get("geometry"))
+    if kind == "GeometryCollection":
+        return [g for sub in geojson["geometries"] for g in _geometries(sub)]
+    return [{"type": kind, "coordinates": _round_coords(geojson["coordinates"])}]
+
+
+def output_paths(gif):
+    """Return the files and directories a render writes next to its GIF."""
+    stem = os.path.splitext(gif)[0]
+    return [gif, f"{stem}.mp4", *store_paths(gif), fire_path(gif), hls_dir(gif)]
+
+
+def remove_outputs(gif):
+    """Delete a render's GIF and everything written next to it."""
+    for path in output_paths(gif):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def geometry_fingerprint(geojson):
+    """Return a stable hash of the geometries in a GeoJSON-like object.
+
+    Feature properties are ignored and coordinates are rounded so that the same
+    ROI uploaded or selected twice maps to the same key.
+    """
+    payload = json.dumps(_geometries(geojson), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def spec_key(spec):
+    """Return the content address of a timelapse spec (ROI + render parameters)."""
+    payload = {k: v for k, v in spec.items() if k != "roi"}
+    payload["roi"] = geometry_fingerprint(spec.get("roi"))
+    payload = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Size-bounded LRU cache of rendered GIF/MP4 pairs, shared across processes.
+
+    Files live under ``root`` named by their content key and an SQLite index
+    records size and last access time for eviction plus hit/miss counters.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or os.path.dirname(cache_path("renders", "index.db"))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, size INTEGER, has_mp4 INTEGER, "
+                "created REAL, last_access REAL, hits INTEGER DEFAULT 0, "
+                "expires REAL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if "expires" not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN expires REAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, f"{key}{ext}")
+
+    def _bump(self, conn, name):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, key):
+        """Return ``(gif, mp4)`` paths for a cached render, or None on a miss.
+
+        An entry past its ``expires`` time counts as a miss.
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT has_mp4, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            gif = self._path(key, ".gif")
+            expired = row is not None and row[1] is not None and row[1] < time.time()
+            if row is None or expired or not os.path.exists(gif):
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bump(conn, "misses")
+                return None
+            conn.execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self._bump(conn, "hits")
+        mp4 = self._path(key, ".mp4") if row[0] else None
+        return gif, mp4
+
+    def put(self, key, gif, mp4=None, ttl=None):
+        """Move a rendered GIF (and optional MP4) into the cache and return the
+        cached paths.
+
+        A frame store, fire GIF and HLS renditions written next to the GIF
+        are moved along with it, and whatever else the render left there is
+        deleted. With ``ttl`` the entry is only served for that many seconds.
+        """
+        files = [(gif, ".gif")]
+        if mp4 is not None and os.path.exists(mp4):
+            files.append((mp4, ".mp4"))
+        has_mp4 = len(files) > 1
+        frames, labels = store_paths(gif)
+        if os.path.exists(frames) and os.path.exists(labels):
+            files += [(frames, ".npy"), (labels, ".json")]
+        if os.path.exists(fire_path(gif)):
+            files.append((fire_path(gif), "_fire.gif"))
+        size = 0
+        try:
+            for src, ext in files:
+                dst = self._path(key, ext)
+                # Renders are written to the temp directory, which may be on
+                # another file system, so move next to the entry first.
+                tmp = f"{dst}.{os.getpid()}.tmp"
+                shutil.move(src, tmp)
+                os.replace(tmp, dst)
+                size += os.path.getsize(dst)
+            if os.path.isdir(hls_dir(gif)):
+                dst = self._path(key, "_hls")
+                shutil.rmtree(dst, ignore_errors=True)
+                shutil.move(hls_dir(gif), dst)
+                for dirpath, _, names in os.walk(dst):
+                    size += sum(
+                        os.path.getsize(os.path.join(dirpath, n)) for n in names
+                    )
+        finally:
+            remove_outputs(gif)
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, size, has_mp4, created, last_access, expires) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, size, int(has_mp4), now, now, None if ttl is None else now + ttl),
+            )
+            self._evict(conn, keep=key)
+        return self._path(key, ".gif"), self._path(key, ".mp4") if has_mp4 else None
+
+    def _evict(self, conn, keep=None):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute(
+            "SELECT key, size FROM entries WHERE key != ? ORDER BY last_access",
+            (keep or "",),
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            for ext in (".gif", ".mp4", ".npy", ".json", "_fire.gif"):
+                try:
+                    os.remove(self._path(key, ext))
+                except FileNotFoundError:
+                    pass
+            shutil.rmtree(self._path(key, "_hls"), ignore_errors=True)
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bump(conn, "evictions")
+            total -= size
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current cache footprint."""
+        with self._connect() as conn:
+            stats = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "evictions": stats.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+        }
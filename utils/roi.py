@@ -0,0 +1,85 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import fiona
+import geopandas as gpd
+import shapely
+from fiona.io import ZipMemoryFile
+
+from utils import cache_path
+
+# Largest number of vertices sent to Earth Engine for an uploaded ROI, override
+# with TIMELAPSE_ROI_MAX_VERTICES. Larger uploads are simplified to fit.
+MAX_VERTICES = int(os.environ.get("TIMELAPSE_ROI_MAX_VERTICES", 5000))
+
+
+def read_upload(data, name):
+    """Read uploaded bytes into a GeoDataFrame without writing a temp file.
+
+    Zipped shapefiles are opened in place from the archive bytes.
+    """
+    if name.lower().endswith(".kml"):
+        fiona.drvsupport.supported_drivers["KML"] = "rw"
+        with fiona.BytesCollection(data, driver="KML") as collection:
+            return gpd.GeoDataFrame.from_features(collection, crs=collection.crs)
+    if name.lower().endswith(".zip"):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            layers = [n for n in archive.namelist() if n.lower().endswith(".shp")]
+        with ZipMemoryFile(data) as memfile:
+            with memfile.open(layers[0] if layers else None) as collection:
+                return gpd.GeoDataFrame.from_features(collection, crs=collection.crs)
+    with fiona.BytesCollection(data) as collection:
+        return gpd.GeoDataFrame.from_features(collection, crs=collection.crs)
+
+
+def count_vertices(gdf):
+    return int(shapely.get_num_coordinates(gdf.geometry.values).sum())
+
+
+def simplify_to_budget(gdf, max_vertices=MAX_VERTICES):
+    """Simplify geometries until they have at most ``max_vertices`` in total.
+
+    The tolerance starts at a tiny fraction of the ROI extent and doubles until
+    the budget is met. Simplification preserves topology, so polygons never
+    self-intersect or collapse.
+    """
+    if count_vertices(gdf) <= max_vertices:
+        return gdf
+    xmin, ymin, xmax, ymax = gdf.total_bounds
+    extent = max(xmax - xmin, ymax - ymin)
+    tolerance = extent * 1e-5
+    simplified = gdf
+    # Many small parts cannot drop below a few vertices each; stop at the extent.
+    while count_vertices(simplified) > max_vertices and tolerance < extent:
+        geometry = gdf.geometry.simplify(tolerance, preserve_topology=True)
+        simplified = gdf.set_geometry(geometry)
+        tolerance *= 2
+    return simplified
+
+
+def load_upload(data, name, max_vertices=MAX_VERTICES):
+    """Return an uploaded vector file as a simplified WGS84 GeoDataFrame.
+
+    ``data`` holds the bytes of a GeoJSON, KML or zipped shapefile. Results are
+    cached on disk by the content hash of the upload, so reruns and repeated
+    uploads of the same file skip parsing and simplification.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = cache_path("roi", f"{digest}-{max_vertices}.geojson")
+    if os.path.exists(path):
+        with open(path) as f:
+            return gpd.GeoDataFrame.from_features(json.load(f), crs="EPSG:4326")
+
+    gdf = read_upload(data, name)
+    if gdf.crs is None:
+        gdf = gdf.set_crs("EPSG:4326")
+    gdf = simplify_to_budget(gdf.to_crs("EPSG:4326"), max_vertices)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(gdf.to_json())
+    os.replace(tmp, path)
+    return gdf
@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+
+import ee
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from utils import cache_path
+from utils.classification import (
+    BANDS,
+    DATE_RANGE,
+    LABEL,
+    TRAIN_FRACTION,
+    label_image,
+    landsat_image,
+)
+
+# Columns added to the sampled bands and label.
+RANDOM = "random"
+BATCH = "batch"
+
+
+def sample_key(bounds, bands=BANDS, seed=0):
+    """Return the store key of the training sample of an ROI."""
+    payload = json.dumps(
+        {
+            "bounds": [round(b, 6) for b in bounds],
+            "bands": list(bands),
+            "dates": list(DATE_RANGE),
+            "seed": int(seed),
+        }
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def fetch_sample(bounds, bands, num_pixels, seed):
+    """Sample labelled pixels over ``bounds`` on Earth Engine as a GeoDataFrame."""
+    roi = ee.Geometry.Rectangle(list(bounds))
+    sample = (
+        landsat_image(roi, bands)
+        .addBands(label_image(roi).select(LABEL))
+        .sample(region=roi, numPixels=num_pixels, seed=seed, geometries=True)
+    )
+    gdf = ee.data.computeFeatures(
+        {"expression": sample, "fileFormat": "GEOPANDAS_GEODATAFRAME"}
+    )
+    gdf = gdf.set_crs("EPSG:4326", allow_override=True)
+    return gdf[list(bands) + [LABEL, "geometry"]]
+
+
+class SampleStore:
+    """GeoParquet store of the labelled training samples drawn per ROI.
+
+    Each ROI keeps one table of sampled pixels with their bands, label, point
+    geometry and a ``random`` column fixing its training/validation split.
+    Every classifier and later session reads the table instead of sampling
+    Landsat and the ESRI mosaic again. Asking for more pixels than stored
+    samples only the difference, in a new ``batch`` with its own seed, and
+    appends it; stored rows and their split never change. Earth Engine often
+    returns fewer pixels than asked (masked pixels are dropped), so the largest
+    count asked for is recorded and the shortfall accepted: only a larger
+    request samples again.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.path.dirname(cache_path("samples", ".keep"))
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.parquet")
+
+    def _state_path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def _state(self, key, stored):
+        """Return the largest pixel count sampled for and the batches drawn."""
+        if stored is None:
+            return 0, 0
+        try:
+            with open(self._state_path(key)) as f:
+                state = json.load(f)
+            return state["attempted"], state["batches"]
+        except (FileNotFoundError, ValueError, KeyError):
+            # Stores written before attempts were recorded.
+            if not len(stored):
+                return 0, 1
+            return len(stored), int(stored[BATCH].max()) + 1
+
+    def _save_state(self, key, attempted, batches):
+        path = self._state_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"attempted": attempted, "batches": batches}, f)
+        os.replace(tmp, path)
+
+    def read(self, bounds, bands=BANDS, seed=0):
+        """Return the stored sample of an ROI, or None."""
+        path = self._path(sample_key(bounds, bands, seed))
+        if not os.path.exists(path):
+            return None
+        return gpd.read_parquet(path)
+
+    def _top_up(self, stored, bounds, bands, num_pixels, seed, batch):
+        missing = num_pixels - (0 if stored is None else len(stored))
+        # Each batch uses its own seed so it draws pixels not sampled before.
+        new = fetch_sample(bounds, bands, missing, seed + batch)
+        if stored is not None:
+            new = new[~new.geometry.to_wkb().isin(set(stored.geometry.to_wkb()))]
+        rng = np.random.default_rng([seed, batch])
+        new = new.assign(**{RANDOM: rng.random(len(new)), BATCH: batch})
+        if stored is None:
+            return new.reset_index(drop=True)
+        return gpd.GeoDataFrame(
+            pd.concat([stored, new], ignore_index=True), crs=stored.crs
+        )
+
+    def get(self, bounds, bands=BANDS, num_pixels=1000, seed=0):
+        """Return ``num_pixels`` sampled rows of an ROI, or all there are.
+
+        Rows come in the order they were sampled, so a smaller request is a
+        stable prefix of a larger one.
+        """
+        key = sample_key(bounds, bands, seed)
+        path = self._path(key)
+        with self._lock:
+            stored = self.read(bounds, bands, seed)
+            before = 0 if stored is None else len(stored)
+            attempted, batches = self._state(key, stored)
+            if num_pixels > max(before, attempted):
+                grown = self._top_up(stored, bounds, bands, num_pixels, seed, batches)
+                if stored is None or len(grown) > before:
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    grown.to_parquet(tmp)
+                    os.replace(tmp, path)
+                self._save_state(key, num_pixels, batches + 1)
+                stored = grown
+        return stored.iloc[:num_pixels]
+
+
+@functools.lru_cache(maxsize=None)
+def default_store():
+    """Return the sample store shared by the threads of this process."""
+    return SampleStore()
+
+
+def to_collection(rows, bands=BANDS):
+    """Return sampled rows as an ee.FeatureCollection of band and label values."""
+    records = json.loads(rows[list(bands) + [LABEL]].to_json(orient="records"))
+    return ee.FeatureCollection([ee.Feature(None, record) for record in records])
+
+
+def split(rows, bands=BANDS):
+    """Return the ``(training, validation)`` ee.FeatureCollections of a sample."""
+    train = rows[RANDOM] <= TRAIN_FRACTION
+    return to_collection(rows[train], bands), to_collection(rows[~train], bands)
@@ -0,0 +1,179 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Port and interface of the artifact server (port 0 picks a free port),
+# override with TIMELAPSE_STATIC_PORT and TIMELAPSE_STATIC_HOST. The server is
+# only used when TIMELAPSE_STATIC_BASE_URL gives the URL browsers reach it at,
+# typically an https path of the app's reverse proxy.
+DEFAULT_PORT = int(os.environ.get("TIMELAPSE_STATIC_PORT", 8765))
+DEFAULT_HOST = os.environ.get("TIMELAPSE_STATIC_HOST", "127.0.0.1")
+BASE_URL = os.environ.get("TIMELAPSE_STATIC_BASE_URL")
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 1024 * 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def file_digest(path):
+    """Return the content hash of a file, or of all files under a directory."""
+    paths = [path]
+    if os.path.isdir(path):
+        paths = sorted(
+            os.path.join(dirpath, name)
+            for dirpath, _, names in os.walk(path)
+            for name in names
+        )
+    h = hashlib.sha256()
+    for file_path in paths:
+        h.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+    return h.hexdigest()[:32]
+
+
+class StaticServer:
+    """Serve rendered artifacts over HTTP under content-hash URLs.
+
+    ``url(path)`` registers a file and returns ``<base>/files/<digest>/<name>``;
+    the URL changes whenever the content does, so responses carry a strong
+    ETag and an immutable Cache-Control and browsers fetch each file once.
+    Byte ranges are supported for MP4 seeking. ``url(directory, entry)``
+    serves a whole directory such as an HLS rendition ladder, whose playlists
+    refer to their segments by relative URLs. The server runs on a daemon
+    thread of the calling process.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, host=DEFAULT_HOST, base_url=BASE_URL):
+        self._files = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        port = self.httpd.server_address[1]
+        self.base_url = (base_url or f"http://localhost:{port}").rstrip("/")
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path, entry=None):
+        """Return the content-hash URL of a file, registering it for serving.
+
+        For a directory, return the URL of the file ``entry`` inside it.
+        """
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            digest = cached[1]
+        else:
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[path] = ((stat.st_mtime_ns, stat.st_size), digest)
+        with self._lock:
+            self._files[digest] = path
+        name = entry if os.path.isdir(path) else os.path.basename(path)
+        return f"{self.base_url}/files/{digest}/{name}"
+
+    def lookup(self, digest, name):
+        """Return the file path served for ``/files/<digest>/<name>``, or None."""
+        with self._lock:
+            path = self._files.get(digest)
+        if path is None or not os.path.isdir(path):
+            return path
+        root = os.path.realpath(path)
+        target = os.path.realpath(os.path.join(root, name))
+        return target if target.startswith(root + os.sep) else None
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class ArtifactHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                self._serve(body=False)
+
+            def do_GET(self):
+                self._serve(body=True)
+
+            def _serve(self, body):
+                parts = self.path.split("?")[0].strip("/").split("/", 2)
+                path = None
+                if len(parts) == 3 and parts[0] == "files":
+                    path = server.lookup(parts[1], parts[2])
+                if path is None or not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                etag = f'"{parts[1]}/{parts[2]}"'
+                if etag in self.headers.get("If-None-Match", ""):
+                    self.send_response(304)
+                    self._common_headers(etag)
+                    self.end_headers()
+                    return
+
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                status = 200
+                requested = self.headers.get("Range")
+                if requested:
+                    match = _RANGE.match(requested.strip())
+                    if match is None or match.groups() == ("", ""):
+                        return self._unsatisfiable(size)
+                    first, last = match.groups()
+                    if first:
+                        start = int(first)
+                        end = min(int(last), size - 1) if last else size - 1
+                    else:
+                        start = max(size - int(last), 0)
+                    if start > end or start >= size:
+                        return self._unsatisfiable(size)
+                    status = 206
+
+                self.send_response(status)
+                self._common_headers(etag)
+                content_type = (
+                    mimetypes.guess_type(path)[0] or "application/octet-stream"
+                )
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                if body:
+                    with open(path, "rb") as f:
+                        f.seek(start)
+                        self._copy(f, end - start + 1)
+
+            def _copy(self, f, length):
+                while length > 0:
+                    chunk = f.read(min(CHUNK_SIZE, length))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    length -= len(chunk)
+
+            def _common_headers(self, etag):
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", CACHE_CONTROL)
+                self.send_header("Accept-Ranges", "bytes")
+                # hls.js fetches playlists and segments from the app's origin.
+                self.send_header("Access-Control-Allow-Origin", "*")
+
+            def _unsatisfiable(self, size):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return ArtifactHandler
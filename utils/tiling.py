@@ -0,0 +1,92 @@
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+
+# Largest tile side requested from Earth Engine in one thumbnail, override with
+# TIMELAPSE_MAX_TILE_SIDE. Keeps each request well under the thumbnail byte limit.
+MAX_TILE_SIDE = int(os.environ.get("TIMELAPSE_MAX_TILE_SIDE", 2048))
+
+EARTH_RADIUS = 6378137.0
+
+Tile = namedtuple("Tile", ["x", "y", "width", "height", "bounds"])
+
+
+def geojson_bounds(geojson):
+    """Return (west, south, east, north) of all coordinates in a GeoJSON object."""
+    xs, ys = [], []
+
+    def walk(obj):
+        if isinstance(obj, dict):
+            if "coordinates" in obj:
+                walk(obj["coordinates"])
+            for key in ("features", "geometries"):
+                for item in obj.get(key, []):
+                    walk(item)
+            if obj.get("geometry") is not None:
+                walk(obj["geometry"])
+        elif obj and isinstance(obj[0], (int, float)):
+            xs.append(obj[0])
+            ys.append(obj[1])
+        else:
+            for item in obj:
+                walk(item)
+
+    walk(geojson)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def to_mercator(lon, lat):
+    """Project a WGS84 coordinate to EPSG:3857 metres."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = math.radians(lon) * EARTH_RADIUS
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def frame_size(bounds, dimensions):
+    """Return the (width, height) of a frame whose longer side is ``dimensions``."""
+    xmin, ymin = to_mercator(bounds[0], bounds[1])
+    xmax, ymax = to_mercator(bounds[2], bounds[3])
+    aspect = (xmax - xmin) / (ymax - ymin)
+    if aspect >= 1:
+        return int(dimensions), max(1, round(dimensions / aspect))
+    return max(1, round(dimensions * aspect)), int(dimensions)
+
+
+def plan_tiles(bounds, dimensions, max_side=MAX_TILE_SIDE):
+    """Split a frame over ``bounds`` into tiles of at most ``max_side`` pixels.
+
+    Returns ``(width, height, tiles)``. Each tile covers an exact block of frame
+    pixels and carries its EPSG:3857 bounds, so mosaicked tiles line up.
+    """
+    width, height = frame_size(bounds, dimensions)
+    xmin, ymin = to_mercator(bounds[0], bounds[1])
+    xmax, ymax = to_mercator(bounds[2], bounds[3])
+    xres, yres = (xmax - xmin) / width, (ymax - ymin) / height
+
+    cols, rows = math.ceil(width / max_side), math.ceil(height / max_side)
+    xs = np.linspace(0, width, cols + 1).round().astype(int)
+    ys = np.linspace(0, height, rows + 1).round().astype(int)
+
+    tiles = []
+    for y0, y1 in zip(ys[:-1], ys[1:]):
+        for x0, x1 in zip(xs[:-1], xs[1:]):
+            tile_bounds = (
+                float(xmin + x0 * xres),
+                float(ymax - y1 * yres),
+                float(xmin + x1 * xres),
+                float(ymax - y0 * yres),
+            )
+            tiles.append(Tile(int(x0), int(y0), int(x1 - x0), int(y1 - y0), tile_bounds))
+    return width, height, tiles
+
+
+def mosaic(tiles, arrays, width, height, channels=3):
+    """Assemble tile arrays into one ``(height, width, channels)`` frame."""
+    frame = np.zeros((height, width, channels), dtype=np.uint8)
+    for tile, array in zip(tiles, arrays):
+        block = array[: tile.height, : tile.width, :channels]
+        frame[tile.y : tile.y + block.shape[0], tile.x : tile.x + block.shape[1]] = block
+    return frame
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+
+import geemap.foliumap as geemap
+
+from utils.collections import (
+    ANY_COLLECTION,
+    FRAME_COLLECTIONS,
+    GOES,
+    GOES_FIRE,
+    LANDSAT,
+    MODIS_LST,
+    MODIS_NDVI,
+    MODIS_OCEAN,
+    NAIP,
+    SENTINEL2,
+)
+from utils.frame_fetch import request_slot
+from utils.frame_store import open_frames, store_from_gif
+from utils.overlays import resolve_overlay
+from utils.pipeline import frames_settled, render_frames
+from utils.render_cache import (
+    UNSETTLED_TTL,
+    RenderCache,
+    remove_outputs,
+    spec_key,
+)
+
+# geemap renderer and the name of its ROI keyword for each collection.
+RENDERERS = {
+    LANDSAT: (geemap.landsat_timelapse, "roi"),
+    SENTINEL2: (geemap.sentinel2_timelapse, "roi"),
+    GOES: (geemap.goes_timelapse, "roi"),
+    GOES_FIRE: (geemap.goes_fire_timelapse, "region"),
+    MODIS_NDVI: (geemap.modis_ndvi_timelapse, "roi"),
+    MODIS_LST: (geemap.create_timelapse, "region"),
+    MODIS_OCEAN: (geemap.modis_ocean_color_timelapse, "region"),
+    ANY_COLLECTION: (geemap.create_timelapse, "region"),
+    NAIP: (geemap.naip_timelapse, "roi"),
+}
+
+
+def gdf_to_geojson(gdf):
+    """Return the geometries of a GeoDataFrame as a WGS84 GeoJSON dict."""
+    if gdf.crs is not None:
+        gdf = gdf.to_crs("epsg:4326")
+    return json.loads(gdf.geometry.to_json())
+
+
+def build_spec(kind, roi, reduce_gif=False, **params):
+    """Describe a timelapse render as a plain, picklable dict.
+
+    ``kind`` is one of the collection names of utils.collections, stored as
+    the spec's ``"collection"``. ``roi`` is a GeoJSON dict and ``params`` are
+    the keyword arguments of the geemap renderer for ``kind`` (without the
+    ROI and output path); they may include geemap's own ``collection``.
+    """
+    return {
+        "collection": kind,
+        "roi": roi,
+        "reduce_gif": reduce_gif,
+        "params": params,
+    }
+
+
+def render_timelapse(spec, out_gif, progress=None, stats=None):
+    """Render ``spec`` and return the path of the GIF, or None.
+
+    ``progress(done, total)`` is called as frames complete. Collections in
+    FRAME_COLLECTIONS fetch their frames concurrently and are encoded in one
+    streaming pass (already palette-optimized, so ``reduce_gif`` is skipped);
+    the others are rendered by geemap in one request and only report start
+    and finish. Their second gifsicle pass only runs if ``reduce_gif`` is set,
+    which the Timelapse page never does. Timings are recorded in ``stats``.
+    """
+    progress = progress or (lambda done, total: None)
+    if spec["collection"] in FRAME_COLLECTIONS:
+        return render_frames(spec, out_gif, progress, stats=stats)
+
+    # No frame cache here: restyling these collections renders them again.
+    progress(0, 1)
+    renderer, roi_arg = RENDERERS[spec["collection"]]
+    kwargs = resolve_overlay(dict(spec["params"]), spec["roi"])
+    kwargs["out_gif"] = out_gif
+    if spec["roi"] is not None:
+        kwargs[roi_arg] = geemap.geojson_to_ee(spec["roi"], geodesic=False)
+    start = time.perf_counter()
+    with request_slot():
+        renderer(**kwargs)
+    if stats is not None:
+        stats["render_seconds"] = round(time.perf_counter() - start, 3)
+
+    if not os.path.exists(out_gif):
+        return None
+    if spec.get("reduce_gif"):
+        geemap.reduce_gif_size(out_gif)
+    progress(1, 1)
+    return out_gif
+
+
+def render_cached(spec, cache=None, progress=None, stats=None):
+    """Return ``(gif, mp4)`` for ``spec``, rendering only on a cache miss.
+
+    ``mp4`` is None when the MP4 output was not requested or not produced.
+    Renders whose last period has not settled yet (e.g. the current year) are
+    cached for UNSETTLED_TTL only, so they are rendered again and refetch the
+    periods that changed.
+    """
+    cache = cache or RenderCache()
+    key = spec_key(spec)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+
+    out_gif = geemap.temp_file_path(".gif")
+    try:
+        if render_timelapse(spec, out_gif, progress, stats) is None:
+            return None, None
+        if open_frames(out_gif) is None:
+            store_from_gif(out_gif)
+        out_mp4 = out_gif.replace(".gif", ".mp4")
+        if not (spec["params"].get("mp4") and os.path.exists(out_mp4)):
+            out_mp4 = None
+        ttl = None
+        if spec["collection"] in FRAME_COLLECTIONS and not frames_settled(spec):
+            ttl = UNSETTLED_TTL
+        return cache.put(key, out_gif, out_mp4, ttl=ttl)
+    finally:
+        # The cache moved what it keeps; drop anything a failed render left.
+        remove_outputs(out_gif)